@@ -5,10 +5,11 @@ import os, json, traceback, requests, re
 import threading
 import time
 import queue
-from pywebpush import webpush
+from concurrent.futures import ThreadPoolExecutor
+from pywebpush import webpush, WebPushException
 import json
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
 from tennis_core import run_all
 import refresh_and_notify
@@ -29,6 +30,9 @@ DATABASE_URL = os.environ["DATABASE_URL"]
 VAPID_PRIVATE_KEY = os.environ["VAPID_PRIVATE_KEY"]
 KST = timezone(timedelta(hours=9))
 MIN_REFRESH_INTERVAL = timedelta(minutes=5)
+PUSH_WORKERS = refresh_and_notify.push_concurrency()
+# 푸시 엔드포인트 HTTPS 연결을 요청/스레드 간에 재사용 (TLS 핸드셰이크 per push 방지)
+PUSH_SESSION = refresh_and_notify.make_push_session(PUSH_WORKERS)
 db_initialized = False
 
 # =========================
@@ -261,6 +265,16 @@ def refresh():
                     }
 
                 fired = 0
+                # baseline/sent 기록은 행마다 insert하지 않고 모아서 마지막에 한 번에 넣는다
+                baseline_rows = []
+                sent_rows = []
+                # 푸시는 루프에서 모아 두었다가 DB 작업이 끝난 뒤 스레드풀로 동시에 보낸다
+                push_jobs = []
+                dead_sids = set()
+                # 아직 DB에 안 들어간 기록은 SELECT로 안 보이므로 이번 요청 안에서는 메모리로 중복을 막는다
+                # (같은 구독이 같은 코트/날짜에 시간 조건만 다른 알람을 여러 개 가질 수 있음)
+                staged_baseline = {}  # (subscription_id, court_group, date) -> baseline times
+                staged_sent = set()   # (subscription_id, slot_key)
 
                 for alarm in alarms:
                     subscription_id = alarm["subscription_id"]
@@ -271,16 +285,20 @@ def refresh():
                     if not group_cids:
                         continue
 
-                    # 🔑 이 알람(사람+코트+날짜)의 baseline 로드
-                    cur.execute("""
-                        SELECT time_content
-                        FROM baseline_slots
-                        WHERE subscription_id = %s
-                        AND court_group = %s
-                        AND date = %s
-                    """, (subscription_id, alarm_group, alarm_date))
+                    # 🔑 이 알람(사람+코트+날짜)의 baseline 로드 (이번 요청에서 이미 읽었으면 그 set을 공유)
+                    baseline_key = (subscription_id, alarm_group, alarm_date)
+                    baseline = staged_baseline.get(baseline_key)
+                    if baseline is None:
+                        cur.execute("""
+                            SELECT time_content
+                            FROM baseline_slots
+                            WHERE subscription_id = %s
+                            AND court_group = %s
+                            AND date = %s
+                        """, (subscription_id, alarm_group, alarm_date))
 
-                    baseline = {r["time_content"] for r in cur.fetchall()}
+                        baseline = {r["time_content"] for r in cur.fetchall()}
+                        staged_baseline[baseline_key] = baseline
 
                     # 🔥 최초 refresh → baseline 초기화만 하고 알람 ❌
                     if not baseline:
@@ -289,8 +307,10 @@ def refresh():
                             for slot in current_slots
                             if slot["cid"] in group_cids and slot["date"] == alarm_date
                         }
-                        for t in times:
-                            add_to_baseline(cur, subscription_id, alarm_group, alarm_date, t)
+                        baseline_rows.extend(
+                            (subscription_id, alarm_group, alarm_date, t) for t in times
+                        )
+                        baseline.update(times)
                         continue
                             # ❗ 최초 refresh에서는 절대 알람 안 울림
                     print("DEBUG alarm:", subscription_id, alarm_group, alarm_date)
@@ -315,6 +335,8 @@ def refresh():
 
                         # 중복 발송 방지 (group 기준)
                         slot_key = f"{alarm_group}|{alarm_date}|{slot['time']}"
+                        if (subscription_id, slot_key) in staged_sent:
+                            continue
 
                         cur.execute("""
                             SELECT 1 FROM sent_slots
@@ -323,31 +345,52 @@ def refresh():
                         if cur.fetchone():
                             continue
 
-                        # 🔔 알람 발송
-                        send_push_notification(
-                            sub,
-                            title="🎾 예약 가능 알림",
-                            body=f"{alarm_group} {alarm_date} {slot['time']}"
-                        )
-                        fired += 1
-                        print(f"[INFO] push sent to {subscription_id} | {alarm_group} | {alarm_date} | {slot['time']}")
-
-                        # 기록
-                        add_to_baseline(
-                            cur,
-                            subscription_id,
-                            alarm_group,
-                            alarm_date,
-                            slot["time"]
-                        )
+                        # 🔔 알람 발송 대상 (같은 시간 중복은 baseline으로 막음)
                         baseline.add(slot["time"])
-
-                        cur.execute("""
-                            INSERT INTO sent_slots (subscription_id, slot_key)
-                            VALUES (%s, %s)
-                            ON CONFLICT DO NOTHING
-                        """, (subscription_id, slot_key))
-
+                        staged_sent.add((subscription_id, slot_key))
+                        push_jobs.append((sub, subscription_id, alarm_group, alarm_date, slot["time"], slot_key))
+
+                def _send(job):
+                    sub, _, alarm_group, alarm_date, time_content, _ = job
+                    send_push_notification(
+                        sub,
+                        title="🎾 예약 가능 알림",
+                        body=f"{alarm_group} {alarm_date} {time_content}"
+                    )
+
+                if push_jobs:
+                    with ThreadPoolExecutor(max_workers=min(PUSH_WORKERS, len(push_jobs))) as ex:
+                        futures = [(job, ex.submit(_send, job)) for job in push_jobs]
+                        for job, f in futures:
+                            _, subscription_id, alarm_group, alarm_date, time_content, slot_key = job
+                            try:
+                                f.result()
+                            except WebPushException as e:
+                                # 실패한 건은 기록하지 않아 다음 refresh에서 다시 시도
+                                print(f"[WARN] push failed to {subscription_id}: {e}")
+                                code = getattr(getattr(e, "response", None), "status_code", None)
+                                if code in refresh_and_notify.DEAD_PUSH_STATUS:
+                                    dead_sids.add(subscription_id)
+                                continue
+                            except Exception as e:
+                                # 연결 오류/타임아웃 등: 이 건만 건너뛰고 성공한 건은 그대로 커밋
+                                print(f"[WARN] push failed to {subscription_id}: {e}")
+                                continue
+                            fired += 1
+                            print(f"[INFO] push sent to {subscription_id} | {alarm_group} | {alarm_date} | {time_content}")
+
+                            # 기록
+                            baseline_rows.append((subscription_id, alarm_group, alarm_date, time_content))
+                            sent_rows.append((subscription_id, slot_key))
+
+                add_to_baseline(cur, baseline_rows)
+                add_to_sent_slots(cur, sent_rows)
+
+                # 만료된 구독(404/410)은 알람과 함께 한 번에 정리
+                if dead_sids:
+                    cur.execute("DELETE FROM alarms WHERE subscription_id = ANY(%s)", (list(dead_sids),))
+                    cur.execute("DELETE FROM push_subscriptions WHERE id = ANY(%s)", (list(dead_sids),))
+                    print(f"[INFO] dead subscriptions deleted={len(dead_sids)}")
 
             conn.commit()
 
@@ -534,7 +577,8 @@ def send_push_notification(subscription, title, body):
         vapid_private_key=VAPID_PRIVATE_KEY,
         vapid_claims={
             "sub": "mailto:ccoo2000@naver.com"
-        }
+        },
+        requests_session=PUSH_SESSION,
     )
 
 # =========================
@@ -555,15 +599,32 @@ def is_in_baseline(cur, subscription_id, cid, date, time_content):
     return cur.fetchone() is not None
 
 # =========================
-# 기준선 슬롯 추가
+# 기준선 슬롯 추가 (refresh 끝에서 한 번에)
 # =========================
-def add_to_baseline(cur, subscription_id, court_group, date, time_content):
-    cur.execute("""
+def add_to_baseline(cur, rows):
+    """rows: [(subscription_id, court_group, date, time_content), ...]"""
+    if not rows:
+        return
+    execute_values(cur, """
         INSERT INTO baseline_slots
             (subscription_id, court_group, date, time_content)
-        VALUES (%s, %s, %s, %s)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, rows, page_size=1000)
+
+
+# =========================
+# 발송 기록 추가 (refresh 끝에서 한 번에)
+# =========================
+def add_to_sent_slots(cur, rows):
+    """rows: [(subscription_id, slot_key), ...]"""
+    if not rows:
+        return
+    execute_values(cur, """
+        INSERT INTO sent_slots (subscription_id, slot_key)
+        VALUES %s
         ON CONFLICT DO NOTHING
-    """, (subscription_id, court_group, date, time_content))
+    """, rows, page_size=1000)
 
 
 # =========================
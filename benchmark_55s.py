@@ -2,18 +2,34 @@
 from __future__ import annotations
 
 import argparse
+import array
 import asyncio
+import bisect
 import calendar
+import itertools
 import json
 import random
 import statistics
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 
 import aiohttp
 
-from tennis_core import get_connector, HEADERS, init_session, fetch_times
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+from tennis_core import get_connector, HEADERS, init_session, fetch_times, run_async
+
+
+def dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False)
 
 
 def build_datevals(days_ahead: int) -> List[str]:
@@ -29,26 +45,84 @@ def build_datevals(days_ahead: int) -> List[str]:
     return out
 
 
-def percentile(values: List[float], p: float) -> float:
+TAIL_PERCENTILES = [50, 90, 95, 99, 99.9]
+TAIL_NAMES = ["p50", "p90", "p95", "p99", "p999"]
+
+
+def percentiles(values: List[float], ps: List[float]) -> List[float]:
+    """
+    여러 백분위를 한 번의 정렬로 계산 (선형 보간, numpy 'linear'와 동일)
+    """
     if not values:
-        return 0.0
+        return [0.0 for _ in ps]
     vs = sorted(values)
-    k = (len(vs) - 1) * (p / 100.0)
-    f = int(k)
-    c = min(f + 1, len(vs) - 1)
-    if f == c:
-        return vs[f]
-    return vs[f] + (vs[c] - vs[f]) * (k - f)
+    last = len(vs) - 1
+    out = []
+    for p in ps:
+        k = last * (p / 100.0)
+        f = int(k)
+        c = min(f + 1, last)
+        out.append(vs[f] + (vs[c] - vs[f]) * (k - f))
+    return out
+
+
+# 1e-4s ~ 10s 로그 간격 64구간 (구간 경계 65개). 범위 밖 값은 양 끝 구간에 넣는다.
+HIST_BINS = 64
+HIST_EDGES = [1e-4 * (1e5 ** (i / HIST_BINS)) for i in range(HIST_BINS + 1)]
+
+
+def hist_add(hist: List[int], value: float) -> None:
+    i = bisect.bisect_right(HIST_EDGES, value) - 1
+    hist[min(max(i, 0), HIST_BINS - 1)] += 1
+
+
+def hist_percentiles(hist: List[int], ps: List[float]) -> List[float]:
+    """
+    히스토그램 누적합으로 백분위 추정 (해당 구간의 상한 경계를 보고, 상대오차 ~20% 이내)
+    """
+    total = sum(hist)
+    if not total:
+        return [0.0 for _ in ps]
+    cdf = list(itertools.accumulate(hist))
+    return [
+        HIST_EDGES[min(bisect.bisect_left(cdf, total * p / 100.0), HIST_BINS - 1) + 1]
+        for p in ps
+    ]
+
+
+def bootstrap_ci(
+    values: List[float],
+    ps: List[float],
+    n_resamples: int = 1000,
+    ci: float = 95.0,
+    rng: random.Random | None = None,
+) -> List[Tuple[float, float]]:
+    """
+    백분위별 부트스트랩 신뢰구간 [(low, high), ...]
+    재표본마다 한 번 정렬해 모든 백분위를 같이 뽑는다.
+    """
+    if not values or n_resamples <= 0:
+        return [(0.0, 0.0) for _ in ps]
+    rng = rng or random.Random()
+    n = len(values)
+    samples: List[List[float]] = [[] for _ in ps]
+    for _ in range(n_resamples):
+        for i, v in enumerate(percentiles(rng.choices(values, k=n), ps)):
+            samples[i].append(v)
+    tail = (100.0 - ci) / 2
+    return [tuple(percentiles(s, [tail, 100.0 - tail])) for s in samples]
 
 
 async def run_timeboxed(
+    session: aiohttp.ClientSession,
     rids: List[str],
     datevals: List[str],
     timebox_s: float,
     concurrency: int,
-    per_request_timeout_s: float,
     shuffle: bool,
     loop: bool,   # 추가
+    bootstrap_resamples: int = 1000,
+    hist_only: bool = False,
     ) -> Dict:
 
     """
@@ -56,81 +130,79 @@ async def run_timeboxed(
     여기서 "크롤링 1개" = fetch_times(POST) 1회로 카운팅.
     """
     # 작업 큐 구성
-    jobs: List[Tuple[str, str]] = [(rid, dv) for rid in rids for dv in datevals]
+    jobs: List[Tuple[str, str]] = list(itertools.product(rids, datevals))
     if shuffle:
         random.shuffle(jobs)
 
-    q: asyncio.Queue[Tuple[str, str]] = asyncio.Queue()
-    for j in jobs:
-        q.put_nowait(j)
+    # 미리 채워진 고정 목록이라 큐 대신 공유 커서로 분배
+    # (next()는 await 없이 끝나므로 워커 간 락 불필요, loop 모드는 무한 순환)
+    cursor = itertools.cycle(jobs) if loop else iter(jobs)
 
     start = time.perf_counter()
     deadline = start + timebox_s
+    # 남은 시간이 너무 없으면 시작하지 않음(마지막 타임아웃 방지)
+    last_start = deadline - 0.3
 
     ok = 0
     fail = 0
-    durations: List[float] = []
-    fail_reasons: Dict[str, int] = {}
-
-    sem = asyncio.Semaphore(concurrency)
-
-    async with aiohttp.ClientSession(
-        connector=get_connector(),
-        headers=HEADERS,
-        timeout=aiohttp.ClientTimeout(total=per_request_timeout_s),
-    ) as session:
-        await init_session(session)
-
-        async def one() -> None:
-            nonlocal ok, fail
-            while True:
-                # 타임박스 종료
-                if time.perf_counter() >= deadline:
-                    return
-
-                try:
-                    rid, dv = q.get_nowait()
-                except asyncio.QueueEmpty:
-                    if not loop:
-                        return
-                    # loop 모드면 jobs를 다시 큐에 채우고 계속 실행
-                    for j in jobs:
-                        q.put_nowait(j)
-                    continue
-
-                # 남은 시간이 너무 없으면 시작하지 않음(마지막 타임아웃 방지)
-                if time.perf_counter() + 0.3 >= deadline:
-                    return
-
-                async with sem:
-                    t0 = time.perf_counter()
-                    try:
-                        lst = await fetch_times(session, dv, rid)  # tennis_core 함수 그대로 사용
-                        dt = time.perf_counter() - t0
-                        durations.append(dt)
-                        if lst:
-                            ok += 1
-                        else:
-                            # 빈 리스트도 "응답은 성공, 예약 가능 시간 없음"일 수 있음
-                            ok += 1
-                    except asyncio.TimeoutError:
-                        dt = time.perf_counter() - t0
-                        durations.append(dt)
-                        fail += 1
-                        fail_reasons["timeout"] = fail_reasons.get("timeout", 0) + 1
-                    except Exception as e:
-                        dt = time.perf_counter() - t0
-                        durations.append(dt)
-                        fail += 1
-                        key = type(e).__name__
-                        fail_reasons[key] = fail_reasons.get(key, 0) + 1
-
-        # 워커 여러 개 실행 (큐는 공유, 실제 동시성은 semaphore가 제어)
-        workers = [asyncio.create_task(one()) for _ in range(max(1, concurrency))]
-        await asyncio.gather(*workers)
+    # float 객체 리스트 대신 double 연속 버퍼 (샘플당 8B, 박싱 없음)
+    # hist_only면 샘플은 버리고 고정 크기 히스토그램만 유지 (메모리 O(구간 수))
+    durations = array.array("d")
+    hist = [0] * HIST_BINS
+    total_s = 0.0
+    fail_reasons: Counter[str] = Counter()
+
+    def record(dt: float) -> None:
+        nonlocal total_s
+        hist_add(hist, dt)
+        total_s += dt
+        if not hist_only:
+            durations.append(dt)
+
+    async def one() -> None:
+        nonlocal ok, fail
+        while True:
+            # 타임박스 종료 (시계는 반복당 한 번만 읽고 t0로 재사용)
+            now = time.perf_counter()
+            if now >= last_start:
+                return
+
+            job = next(cursor, None)
+            if job is None:
+                return
+            rid, dv = job
+
+            t0 = now
+            try:
+                lst = await fetch_times(session, dv, rid)  # tennis_core 함수 그대로 사용
+                record(time.perf_counter() - t0)
+                if lst:
+                    ok += 1
+                else:
+                    # 빈 리스트도 "응답은 성공, 예약 가능 시간 없음"일 수 있음
+                    ok += 1
+            except Exception as e:
+                record(time.perf_counter() - t0)
+                fail += 1
+                fail_reasons["timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__] += 1
+
+    # 워커 여러 개 실행 (커서는 공유, 워커 수가 곧 동시성)
+    # 각 워커가 끝나는 즉시 다음 job을 집고 카운터를 바로 갱신한다.
+    n_workers = max(1, concurrency) if loop else min(max(1, concurrency), len(jobs))
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(n_workers):
+            tg.create_task(one())
 
     elapsed = time.perf_counter() - start
     completed = ok + fail
+    # 샘플을 보관하지 않았거나(--hist-only) 부트스트랩을 끈 경우 신뢰구간은 null로 낸다 ([0, 0]로 오해하지 않게)
+    cis = None
+    if hist_only:
+        p50, p90, p95, p99, p999 = hist_percentiles(hist, TAIL_PERCENTILES)
+    else:
+        p50, p90, p95, p99, p999 = percentiles(durations, TAIL_PERCENTILES)
+        if durations and bootstrap_resamples > 0:
+            cis = bootstrap_ci(durations, TAIL_PERCENTILES, n_resamples=bootstrap_resamples)
 
     return {
         "timebox_s": timebox_s,
@@ -140,10 +212,20 @@ async def run_timeboxed(
         "completed_requests": completed,        # (= POST 횟수)
         "ok_requests": ok,
         "fail_requests": fail,
-        "fail_reasons": fail_reasons,
-        "avg_s": round(statistics.mean(durations), 3) if durations else 0.0,
-        "p50_s": round(percentile(durations, 50), 3) if durations else 0.0,
-        "p95_s": round(percentile(durations, 95), 3) if durations else 0.0,
+        "fail_reasons": dict(fail_reasons),
+        "avg_s": round(total_s / completed, 3) if completed else 0.0,
+        "p50_s": round(p50, 3),
+        "p90_s": round(p90, 3),
+        "p95_s": round(p95, 3),
+        "p99_s": round(p99, 3),
+        "p999_s": round(p999, 3),
+        # 백분위별 95% 부트스트랩 신뢰구간 [low, high] (생략 시 null)
+        "ci95_s": {
+            name: [round(lo, 3), round(hi, 3)]
+            for name, (lo, hi) in zip(TAIL_NAMES, cis)
+        } if cis is not None else None,
+        # 구간별 건수 (run 간 단순 합산 가능), 경계는 HIST_EDGES
+        "hist": hist,
         "rids": len(rids),
         "datevals": len(datevals),
         "loop": loop,
@@ -168,6 +250,8 @@ def parse_args():
     p.add_argument("--repeat", type=int, default=3)
     p.add_argument("--seed", type=int, default=None, help="랜덤 시드(시설 샘플 고정)")
     p.add_argument("--loop", action="store_true", help="55초 끝날 때까지 jobs를 반복해서 최대 처리량 측정")
+    p.add_argument("--bootstrap", type=int, default=1000, help="백분위 신뢰구간용 부트스트랩 재표본 수(0이면 생략)")
+    p.add_argument("--hist-only", action="store_true", help="샘플을 보관하지 않고 히스토그램으로만 백분위 추정(신뢰구간 생략)")
 
     return p.parse_args()
 
@@ -177,28 +261,42 @@ async def main():
     if args.seed is not None:
         random.seed(args.seed)
     rids = load_rids_from_cache(args.facilities_cache)
-    random.shuffle(rids)
-    rids = rids[: args.rid_sample]
+    rids = random.sample(rids, k=min(max(0, args.rid_sample), len(rids)))
 
     datevals = build_datevals(args.days)
 
     runs = []
-    for i in range(args.repeat):
-        res = await run_timeboxed(
-            rids=rids,
-            datevals=datevals,
-            timebox_s=args.timebox,
-            concurrency=args.concurrency,
-            per_request_timeout_s=args.timeout,
-            shuffle=args.shuffle,
-            loop=args.loop,
-        )
-        res["run"] = i + 1
-        runs.append(res)
-        print(json.dumps(res, ensure_ascii=False))
+    # fetch_times는 to_thread 워커 스레드의 스레드별 requests 세션으로 요청한다.
+    # 워커 스레드 풀을 반복 실행 전체에서 하나로 유지해 같은 keep-alive 연결을 계속 쓰게 하고
+    # (매 run 콜드 핸드셰이크 방지), 기본 실행기 크기가 --concurrency를 깎지 않게 맞춘다.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="benchmark")
+    )
+    # aiohttp 세션은 init_session(쿠키 갱신)에만 쓰인다
+    async with aiohttp.ClientSession(
+        connector=get_connector(args.concurrency),
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=args.timeout),
+    ) as session:
+        await init_session(session)
+
+        for i in range(args.repeat):
+            res = await run_timeboxed(
+                session,
+                rids=rids,
+                datevals=datevals,
+                timebox_s=args.timebox,
+                concurrency=args.concurrency,
+                shuffle=args.shuffle,
+                loop=args.loop,
+                bootstrap_resamples=args.bootstrap,
+                hist_only=args.hist_only,
+            )
+            res["run"] = i + 1
+            runs.append(res)
+            print(dumps(res))
 
     completed = [r["completed_requests"] for r in runs]
-    p95 = [r["p95_s"] for r in runs]
     summary = {
         "repeat": args.repeat,
         "concurrency": args.concurrency,
@@ -208,11 +306,16 @@ async def main():
         "completed_avg_per_55s": round(statistics.mean(completed), 2),
         "completed_min": min(completed),
         "completed_max": max(completed),
-        "p95_s_avg": round(statistics.mean(p95), 3),
-        
     }
-    print("SUMMARY:", json.dumps(summary, ensure_ascii=False))
+    for name in TAIL_NAMES:
+        summary[f"{name}_s_avg"] = round(statistics.mean(r[f"{name}_s"] for r in runs), 3)
+        summary[f"{name}_s_max"] = round(max(r[f"{name}_s"] for r in runs), 3)
+    # 히스토그램은 구간별 합산으로 전체 run을 합친 분포가 된다
+    merged = [sum(col) for col in zip(*(r["hist"] for r in runs))]
+    for name, v in zip(TAIL_NAMES, hist_percentiles(merged, TAIL_PERCENTILES)):
+        summary[f"{name}_s_hist"] = round(v, 4)
+    print("SUMMARY:", dumps(summary))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
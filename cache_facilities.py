@@ -1,9 +1,13 @@
 # cache_facilities.py
 import json
-import asyncio
 import aiohttp
 
-from tennis_core import get_connector, HEADERS, init_session, fetch_facilities
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+from tennis_core import get_connector, HEADERS, init_session, fetch_facilities, run_async
 
 OUT = "facilities_cache.json"
 
@@ -12,10 +16,14 @@ async def main():
         await init_session(session)
         facilities = await fetch_facilities(session)
 
-    with open(OUT, "w", encoding="utf-8") as f:
-        json.dump(facilities, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        with open(OUT, "wb") as f:
+            f.write(orjson.dumps(facilities, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(OUT, "w", encoding="utf-8") as f:
+            json.dump(facilities, f, ensure_ascii=False, indent=2)
 
     print(f"[OK] saved: {OUT} (count={len(facilities)})")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
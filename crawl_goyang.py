@@ -9,10 +9,12 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple
 from urllib.parse import quote, urljoin
 
+import lxml.html
 import requests
 from bs4 import BeautifulSoup
 import urllib3
 from requests.adapters import HTTPAdapter
+from requests.compat import chardet
 from urllib3.util.retry import Retry
 try:
     from curl_cffi import requests as curl_requests
@@ -27,6 +29,10 @@ UA = (
     "Chrome/137.0.0.0 Safari/537.36"
 )
 TIME_RE = re.compile(r"(\d{1,2}:\d{2})\s*[~\-]\s*(\d{1,2}:\d{2})")
+COURT_RE = re.compile(r"(\d+)")
+WS_RE = re.compile(r"\s+")
+NON_DIGIT_RE = re.compile(r"\D")
+YYYYMMDD_RE = re.compile(r"\d{8}")
 
 KST = dt.timezone(dt.timedelta(hours=9))
 
@@ -39,6 +45,22 @@ def _bounded_float_env(name: str, default: float, min_value: float = 2.0, max_va
     return max(min_value, min(value, max_value))
 
 
+def _bounded_int_env(name: str, default: int, min_value: int = 1, max_value: int = 16) -> int:
+    try:
+        value = int((os.getenv(name) or str(default)).strip())
+    except ValueError:
+        value = default
+    return max(min_value, min(value, max_value))
+
+
+def _gyt_workers() -> int:
+    return _bounded_int_env("GYT_WORKERS", 6)
+
+
+def _daehwa_workers() -> int:
+    return _bounded_int_env("DAEHWA_WORKERS", 4, max_value=8)
+
+
 def _gyt_timeout() -> float:
     return _bounded_float_env("GYT_TIMEOUT", 8.0)
 
@@ -74,11 +96,8 @@ def build_date_range_kst(
         end_day = calendar.monthrange(now.year, now.month)[1]
         end = dt.date(now.year, now.month, end_day)
 
-    dates: List[str] = []
-    cur = start
-    while cur <= end:
-        dates.append(cur.strftime("%Y-%m-%d"))
-        cur += dt.timedelta(days=1)
+    n_days = max(0, (end - start).days + 1)
+    dates = [(start + dt.timedelta(days=i)).isoformat() for i in range(n_days)]
 
     return cutoff_passed, dates
 
@@ -100,7 +119,8 @@ def make_session() -> requests.Session:
         allowed_methods=frozenset(["GET", "POST"]),
         raise_on_status=False,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    # 코트 10개 × 날짜 요청이 같은 호스트로 몰리므로 keep-alive 풀을 넉넉히 잡아 재핸드셰이크를 막는다
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=20)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
     s.headers.update(
@@ -110,6 +130,7 @@ def make_session() -> requests.Session:
             "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
             "Cache-Control": "no-cache",
             "Pragma": "no-cache",
+            "Connection": "keep-alive",
         }
     )
     return s
@@ -123,10 +144,19 @@ def make_gytennis_session() -> requests.Session:
     return s
 
 
-def fix_encoding(r: requests.Response) -> str:
-    if not r.encoding or r.encoding.lower() in ("iso-8859-1", "ascii"):
-        r.encoding = r.apparent_encoding or "utf-8"
-    return r.text
+def fix_encoding(r: requests.Response, body: bytes | None = None) -> str:
+    if body is None:
+        if not r.encoding or r.encoding.lower() in ("iso-8859-1", "ascii"):
+            r.encoding = r.apparent_encoding or "utf-8"
+        return r.text
+    # stream으로 일부만 읽은 경우: r.content는 다시 못 읽으니 읽은 바이트를 직접 디코드
+    enc = r.encoding
+    if not enc or enc.lower() in ("iso-8859-1", "ascii"):
+        enc = chardet.detect(body)["encoding"] or "utf-8"
+    try:
+        return str(body, enc, errors="replace")
+    except LookupError:
+        return str(body, "utf-8", errors="replace")
 
 
 GYT_BASE = "https://www.gytennis.or.kr/daily"
@@ -152,37 +182,71 @@ def _normalize_time_label(text: str) -> str:
     return s
 
 
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+GYT_TIME_LABELS_XP = f"//table[{_has_class('custom')}]//tr//td[{_has_class('wide')}]"
+GYT_COURT_TABLES_XP = f"//table[{_has_class('innerCustom')}]"
+GYT_COURT_TAG_XP = f".//td[{_has_class('courtTag')}]"
+GYT_RES_TAG_XP = f".//td[{_has_class('resTag')}]"
+GYT_EMPTY_SLOT_XP = f".//span[{_has_class('public-empty-slot')}]"
+ENABLED_CHECKBOX_XP = './/input[@type="checkbox" and not(@disabled)]'
+
+
+XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+def _html_doc(html: str):
+    # BeautifulSoup(html, "lxml")과 같은 libxml2 파서를 쓰되 파이썬 노드 객체를 만들지 않는다
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # XHTML 등 <?xml ... encoding="..."?> 선언이 있는 문자열은 lxml이 거부하므로
+        # 이미 디코드된 문자열 기준으로 선언만 떼고 다시 파싱
+        return lxml.html.document_fromstring(XML_DECL_RE.sub("", html, count=1))
+
+
+def _first(node, xpath: str, **variables):
+    found = node.xpath(xpath, **variables)
+    return found[0] if found else None
+
+
 def parse_gytennis_slots(html: str) -> Dict[str, List[dict]]:
-    soup = BeautifulSoup(html, "lxml")
+    doc = _html_doc(html)
+    if doc is None:
+        return {}
 
     time_labels: List[str] = []
-    for td in soup.select("table.custom tr td.wide"):
-        time_labels.append(_normalize_time_label(td.get_text()))
+    for td in doc.xpath(GYT_TIME_LABELS_XP):
+        time_labels.append(_normalize_time_label(td.text_content()))
 
     out: Dict[str, List[dict]] = {}
 
-    for tbl in soup.select("table.innerCustom"):
-        tag = tbl.select_one("td.courtTag")
-        if not tag:
+    for tbl in doc.xpath(GYT_COURT_TABLES_XP):
+        tag = _first(tbl, GYT_COURT_TAG_XP)
+        if tag is None:
             continue
 
-        court_text = " ".join(tag.get_text().split())
-        m = re.match(r"(\d+)", court_text)
+        court_text = " ".join(tag.text_content().split())
+        m = COURT_RE.match(court_text)
         if not m:
             continue
         court_no = m.group(1)
 
-        rows = tbl.select("tr")[1:]
+        rows = tbl.xpath(".//tr")[1:]
         for idx, tr in enumerate(rows):
-            td = tr.select_one("td.resTag")
-            if not td:
+            td = _first(tr, GYT_RES_TAG_XP)
+            if td is None:
                 continue
 
             # gytennis는 비로그인 현황 화면에서 빈 슬롯을 public-empty-slot으로 표시한다.
-            if not td.select_one("span.public-empty-slot"):
+            if _first(td, GYT_EMPTY_SLOT_XP) is None:
                 # 예전 로그인/예약 화면 호환: 활성 checkbox가 있으면 가용 슬롯으로 본다.
-                avail_cb = td.select_one('input[type="checkbox"]:not([disabled])')
-                if not avail_cb:
+                avail_cb = _first(td, ENABLED_CHECKBOX_XP)
+                if avail_cb is None:
                     continue
 
             label = time_labels[idx] if idx < len(time_labels) else f"IDX:{idx}"
@@ -202,7 +266,7 @@ def parse_gytennis_slots(html: str) -> Dict[str, List[dict]]:
 
 
 def _compact_ymd(value: str) -> str:
-    return re.sub(r"\D", "", value or "")
+    return NON_DIGIT_RE.sub("", value or "")
 
 
 def gytennis_html_matches_date(html: str, ymd: str) -> bool:
@@ -533,7 +597,9 @@ def crawl_gytennis() -> dict:
             return {"facilities": facilities, "availability": availability, "partial_failure": True}
 
     futures = []
-    with ThreadPoolExecutor(max_workers=6) as ex:
+    workers = _gyt_workers()
+    print(f"[GYT] requests={len(dates) * 10} workers={workers}")
+    with ThreadPoolExecutor(max_workers=workers) as ex:
         for ymd in dates:
             for cv in range(1, 11):
                 futures.append(ex.submit(_task, cv, ymd))
@@ -718,32 +784,36 @@ def build_payload_daehwa(place_opt: str, yyyymmdd: str) -> Dict[str, str]:
     return build_payload_gys(place_opt, yyyymmdd, part_opt="02")
 
 
-def parse_slots_daehwa(html: str, summary_keyword: str = "이용신청 테이블") -> List[dict]:
-    soup = BeautifulSoup(html, "lxml")
+RENT_CHK_XP = './/input[@name="rent_chk[]"]'
+# parse_slots_daehwa가 고르는 슬롯 표의 summary
+DAEHWA_SUMMARY_KEYWORD = "이용신청 테이블"
+
 
-    table = soup.find("table", attrs={"summary": re.compile(re.escape(summary_keyword))})
-    if not table:
-        for t in soup.find_all("table"):
-            if t.select_one('input[name="rent_chk[]"]'):
-                table = t
-                break
-    if not table:
+def parse_slots_daehwa(html: str, summary_keyword: str = DAEHWA_SUMMARY_KEYWORD) -> List[dict]:
+    doc = _html_doc(html)
+    if doc is None:
+        return []
+
+    table = _first(doc, "//table[contains(@summary, $kw)]", kw=summary_keyword)
+    if table is None:
+        table = _first(doc, '//table[.//input[@name="rent_chk[]"]]')
+    if table is None:
         return []
 
     out = []
-    for tr in table.find_all("tr"):
-        cb = tr.select_one('input[name="rent_chk[]"]')
-        if not cb:
+    for tr in table.xpath(".//tr"):
+        cb = _first(tr, RENT_CHK_XP)
+        if cb is None:
             continue
-        if cb.has_attr("disabled"):
+        if cb.get("disabled") is not None:
             continue
 
         val = (cb.get("value") or "").strip()
-        if re.fullmatch(r"\d{8}", val):
+        if YYYYMMDD_RE.fullmatch(val):
             continue
 
-        txt = re.sub(r"\s+", " ", tr.get_text(" ", strip=True)).strip()
-        m = TIME_RE.search(txt)
+        txt = " ".join(t.strip() for t in tr.itertext() if t.strip())
+        m = TIME_RE.search(WS_RE.sub(" ", txt))
         if not m:
             continue
 
@@ -755,6 +825,63 @@ def parse_slots_daehwa(html: str, summary_keyword: str = "이용신청 테이블
     return out
 
 
+TABLE_TAG_RE = re.compile(rb"<(/?)table\b[^>]*>", re.I)
+# stream 중에는 페이지 인코딩을 모르므로 utf-8/cp949 둘 다 본다.
+DAEHWA_SUMMARY_KEYWORD_BYTES = tuple({DAEHWA_SUMMARY_KEYWORD.encode(enc) for enc in ("utf-8", "cp949")})
+DAEHWA_STREAM_CHUNK = 8192
+# 표가 닫힌 뒤 남은 본문이 이보다 작으면 끝까지 읽어 keep-alive 연결을 재사용한다.
+DAEHWA_DRAIN_MAX = 32 * 1024
+
+
+def _slots_table_end(buf: bytes, scan: dict) -> int:
+    """
+    summary에 DAEHWA_SUMMARY_KEYWORD가 든 첫 표(parse_slots_daehwa가 고르는 표)의 닫힘 위치.
+    아직 안 닫혔으면 -1. scan은 청크 사이에 이어서 보기 위한 상태(pos/depth/target).
+    """
+    for m in TABLE_TAG_RE.finditer(buf, scan["pos"]):
+        scan["pos"] = m.end()
+        if not m.group(1):
+            scan["depth"] += 1
+            if scan["target"] < 0 and any(kw in m.group(0) for kw in DAEHWA_SUMMARY_KEYWORD_BYTES):
+                scan["target"] = scan["depth"]
+        elif scan["depth"]:
+            if scan["depth"] == scan["target"]:
+                return m.end()
+            scan["depth"] -= 1
+    return -1
+
+
+def _read_until_slots_table(r: requests.Response) -> bytes:
+    buf = bytearray()
+    scan = {"pos": 0, "depth": 0, "target": -1}
+    for chunk in r.iter_content(chunk_size=DAEHWA_STREAM_CHUNK):
+        # 청크 경계에 걸린 태그는 다음 청크와 합쳐서 다시 본다 (scan["pos"]는 완성된 태그 뒤에만 이동)
+        buf += chunk
+        end = _slots_table_end(buf, scan)
+        if end < 0:
+            continue
+
+        # 슬롯 표가 닫혔으면 나머지(푸터 등)는 파싱에 필요 없다.
+        # 남은 본문이 DAEHWA_DRAIN_MAX 이하면 끝까지 읽어 keep-alive 연결을 풀에 돌려주고,
+        # 더 크면 그냥 닫는다(with r에서 연결을 버림).
+        length = r.headers.get("Content-Length")
+        if length and length.isdigit():
+            # Content-Length는 압축된 전송 바이트 수이므로 raw.tell()(읽은 전송 바이트)과 비교한다.
+            if int(length) - r.raw.tell() <= DAEHWA_DRAIN_MAX:
+                for _ in r.iter_content(chunk_size=DAEHWA_STREAM_CHUNK):
+                    pass
+        else:
+            # chunked 등 길이를 모르면 DAEHWA_DRAIN_MAX까지만 더 읽어 보고 그 안에 끝나길 기대한다
+            drained = 0
+            for rest in r.iter_content(chunk_size=DAEHWA_STREAM_CHUNK):
+                drained += len(rest)
+                if drained > DAEHWA_DRAIN_MAX:
+                    break
+        return bytes(buf[:end])
+    # 대상 표가 없는 페이지(로그인/오류, summary 없는 표)는 전체를 읽어 기존 fallback 파싱에 맡긴다
+    return bytes(buf)
+
+
 def post_rent(s: requests.Session, payload: Dict[str, str], ssl_fallback_state: dict) -> Tuple[str, str, int]:
     r = _daehwa_post(
         s,
@@ -764,9 +891,12 @@ def post_rent(s: requests.Session, payload: Dict[str, str], ssl_fallback_state:
         allow_redirects=True,
         timeout=_gys_timeout(),
         headers={"Origin": DAEHWA_BASE, "Referer": DAEHWA_RENT},
+        stream=True,
     )
-    html = fix_encoding(r)
-    return html, r.url, r.status_code
+    with r:
+        body = _read_until_slots_table(r)
+    # 연결 반납/정리는 with에서 끝났으니, 읽은 만큼만 본문으로 디코드
+    return fix_encoding(r, body), r.url, r.status_code
 
 
 def crawl_daehwa() -> dict:
@@ -784,37 +914,88 @@ def crawl_daehwa() -> dict:
 
     stats = {"total": 0, "ok": 0, "empty": 0, "fail": 0}
 
-    for ymd in dates_ymd:
-        yyyymmdd = yyyymmdd_from_ymd(ymd)
-
-        day_slots: List[dict] = []
-        for court_no, place_opt in DAEHWA_PLACE.items():
-            stats["total"] += 1
-            try:
-                payload = build_payload_daehwa(place_opt, yyyymmdd)
-                html, final_url, _status = post_rent(s, payload, ssl_fallback_state)
-
-                if is_login_page(html, final_url):
-                    login_daehwa(s, ssl_fallback_state)
-                    html, final_url, _status = post_rent(s, payload, ssl_fallback_state)
-
-                if is_login_page(html, final_url):
-                    raise RuntimeError(f"daehwa login required after retry. final_url={final_url}")
-
-                slots = parse_slots_daehwa(html)
-                for sl in slots:
-                    sl["courtNo"] = str(court_no)
-                if slots:
-                    day_slots.extend(slots)
-                    stats["ok"] += 1
-                else:
-                    stats["empty"] += 1
-            except Exception as e:
-                stats["fail"] += 1
-                print(f"[DAEHWA][ERR] date={ymd} court={court_no} place_opt={place_opt} err={e}")
+    # 로그인은 s 하나로 하고, 워커 스레드는 각자 세션(로그인 쿠키 복사본)을 쓴다.
+    # 세션 만료 시 재로그인은 한 스레드만 s로 수행하고, 나머지 워커는 세대(login_gen)가 바뀌면 쿠키를 다시 받는다.
+    # 워커가 받은 Set-Cookie(세션 갱신 등)도 s에 합치고 세대를 올려 다른 워커에 전파한다.
+    login_lock = threading.Lock()
+    login_gen = [0]
+    worker_local = threading.local()
+    worker_sessions: List[requests.Session] = []
 
-        if day_slots:
-            availability[facility_id].setdefault(ymd, []).extend(day_slots)
+    def _worker_session() -> requests.Session:
+        with login_lock:
+            if getattr(worker_local, "generation", -1) != login_gen[0] or not hasattr(worker_local, "session"):
+                if not hasattr(worker_local, "session"):
+                    worker_local.session = make_session()
+                    worker_sessions.append(worker_local.session)
+                worker_local.session.cookies.clear()
+                worker_local.session.cookies.update(s.cookies)
+                worker_local.generation = login_gen[0]
+            return worker_local.session
+
+    def _relogin(seen_gen: int) -> None:
+        with login_lock:
+            if login_gen[0] == seen_gen:
+                login_daehwa(s, ssl_fallback_state)
+                login_gen[0] += 1
+
+    def _publish_cookies(ws: requests.Session) -> None:
+        with login_lock:
+            # 그 사이 재로그인/갱신으로 세대가 바뀌었으면 옛 쿠키로 덮어쓰지 않는다
+            if worker_local.generation != login_gen[0]:
+                return
+            if ws.cookies.get_dict() != s.cookies.get_dict():
+                s.cookies.update(ws.cookies)
+                login_gen[0] += 1
+                worker_local.generation = login_gen[0]
+
+    def _fetch_court(court_no: int, place_opt: str, yyyymmdd: str) -> List[dict]:
+        payload = build_payload_daehwa(place_opt, yyyymmdd)
+        ws = _worker_session()
+        gen = worker_local.generation
+        html, final_url, _status = post_rent(ws, payload, ssl_fallback_state)
+
+        if is_login_page(html, final_url):
+            _relogin(gen)
+            ws = _worker_session()
+            html, final_url, _status = post_rent(ws, payload, ssl_fallback_state)
+
+        if is_login_page(html, final_url):
+            raise RuntimeError(f"daehwa login required after retry. final_url={final_url}")
+        # 로그인 페이지 응답의 쿠키(비로그인 세션)는 퍼뜨리지 않도록 정상 응답에서만 반영
+        _publish_cookies(ws)
+
+        slots = parse_slots_daehwa(html)
+        for sl in slots:
+            sl["courtNo"] = str(court_no)
+        return slots
+
+    workers = _daehwa_workers()
+    print(f"[DAEHWA] requests={len(dates_ymd) * len(DAEHWA_PLACE)} workers={workers}")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            # 날짜별로 기다리지 않고 전부 먼저 제출해 workers개가 계속 돌게 한다 (결과는 날짜/코트 순서대로 모음)
+            futures = [
+                (ymd, court_no, place_opt, ex.submit(_fetch_court, court_no, place_opt, yyyymmdd_from_ymd(ymd)))
+                for ymd in dates_ymd
+                for court_no, place_opt in DAEHWA_PLACE.items()
+            ]
+
+            for ymd, court_no, place_opt, fut in futures:
+                stats["total"] += 1
+                try:
+                    slots = fut.result()
+                    if slots:
+                        availability[facility_id].setdefault(ymd, []).extend(slots)
+                        stats["ok"] += 1
+                    else:
+                        stats["empty"] += 1
+                except Exception as e:
+                    stats["fail"] += 1
+                    print(f"[DAEHWA][ERR] date={ymd} court={court_no} place_opt={place_opt} err={e}")
+    finally:
+        for ws in worker_sessions:
+            ws.close()
 
     print(f"[DAEHWA][STAT] total={stats['total']} ok={stats['ok']} empty={stats['empty']} fail={stats['fail']}")
 
@@ -1,14 +1,24 @@
 import os
+import heapq
 import json
 import re
 import subprocess
+import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from collections import defaultdict
 from datetime import datetime, date, timedelta, timezone
+from functools import lru_cache
 from typing import Dict, List, Set, Tuple, Optional, Iterable, Any
+from urllib.parse import urlparse
 
 import psycopg
+import requests
 from psycopg.rows import dict_row
-from pywebpush import webpush, WebPushException
+from requests.adapters import HTTPAdapter
+from py_vapid import Vapid
+from pywebpush import WebPusher, WebPushException
 
 import tennis_core
 import crawl_goyang
@@ -21,6 +31,7 @@ import crawl_extra_cities
 from crawler_diagnostics import run_crawler
 
 LAST_FAILED_PREFIXES: Set[str] = set()
+EMPTY_SLOTS: frozenset = frozenset()
 BLOCKED_FRONTEND_PREFIXES: Tuple[str, ...] = ("anseong:", "ggshare:")
 FRONTEND_ALLOWED_PREFIXES: Tuple[str, ...] = (
     "yongin:",
@@ -120,7 +131,9 @@ def to_yyyymmdd(s: str) -> str:
     return s
 
 
+@lru_cache(maxsize=1024)
 def yyyymmdd_to_date(yyyymmdd: str) -> date:
+    # 같은 날짜 문자열이 시설마다 반복 파싱되므로 캐시 (date는 불변이라 공유 안전)
     return date(int(yyyymmdd[0:4]), int(yyyymmdd[4:6]), int(yyyymmdd[6:8]))
 
 
@@ -128,29 +141,42 @@ def date_to_yyyymmdd(d: date) -> str:
     return d.strftime("%Y%m%d")
 
 
+BRACKET_RE = re.compile(r"\[.*?\]")
+TENNIS_SUFFIX = "테니스장"
+SEONGNAM_PAREN_RE = re.compile(r"\s*\([^)]*\)")
+SEONGNAM_SAMEDAY_RE = re.compile(r"\s*당일예약\s*")
+SEONGNAM_HALF_COURT_RE = re.compile(r"\s*반쪽\s*코트.*$")
+SEONGNAM_COURT_NO_RE = re.compile(r"\s*\d+\s*번?\s*코트.*$")
+TRAILING_COURT_NO_RE = re.compile(r"\s*\d+\s*코트\s*$")
+# 인코딩이 깨진 채 저장된 파주 시설명("코트")도 같이 정리
+PAJU_MOJIBAKE_COURT_RE = re.compile(r"\s*\d+\s*肄뷀듃\s*$")
+
+
+@lru_cache(maxsize=4096)
 def get_court_group(title: str, facility_id: str = "") -> str:
-    import re
-    base = re.sub(r"\[.*?\]", "", title or "").split("테니스장")[0].strip()
+    # 순수 함수라 (title, fid)별 결과를 캐시해서 같은 프로세스에서 정규식을 다시 돌리지 않는다
+    base = BRACKET_RE.sub("", title or "").split(TENNIS_SUFFIX, 1)[0].strip()
+    facility_id = str(facility_id)
 
-    if str(facility_id).startswith("yongin:"):
+    if facility_id.startswith("yongin:"):
         return f"용인|{base}"
-    if str(facility_id).startswith("goyang:"):
+    if facility_id.startswith("goyang:"):
         base = normalize_goyang_court_group(base)
         return f"고양|{base}"
-    if str(facility_id).startswith("suwon:"):
+    if facility_id.startswith("suwon:"):
         return f"수원|{base}"
-    if str(facility_id).startswith("seongnam:"):
-        base = re.sub(r"\s*\([^)]*\)", "", base)
-        base = re.sub(r"\s*당일예약\s*", " ", base)
-        base = re.sub(r"\s*반쪽\s*코트.*$", "", base)
-        base = re.sub(r"\s*\d+\s*번?\s*코트.*$", "", base).strip()
+    if facility_id.startswith("seongnam:"):
+        base = SEONGNAM_PAREN_RE.sub("", base)
+        base = SEONGNAM_SAMEDAY_RE.sub(" ", base)
+        base = SEONGNAM_HALF_COURT_RE.sub("", base)
+        base = SEONGNAM_COURT_NO_RE.sub("", base).strip()
         return f"성남|{base}"
-    if str(facility_id).startswith("anyang:"):
-        base = re.sub(r"\s*\d+\s*코트\s*$", "", base).strip()
+    if facility_id.startswith("anyang:"):
+        base = TRAILING_COURT_NO_RE.sub("", base).strip()
         return f"안양|{base}"
-    if str(facility_id).startswith("paju:"):
-        base = re.sub(r"\s*\d+\s*肄뷀듃\s*$", "", base).strip()
-        base = re.sub(r"\s*\d+\s*코트\s*$", "", base).strip()
+    if facility_id.startswith("paju:"):
+        base = PAJU_MOJIBAKE_COURT_RE.sub("", base).strip()
+        base = TRAILING_COURT_NO_RE.sub("", base).strip()
         return f"파주|{base}"
     return base
 
@@ -216,6 +242,42 @@ def slot_matches_time_condition(t: Any, mode: str, hour: Optional[int]) -> bool:
     return start <= target < end
 
 
+SLOT_TIME_KEYS: Tuple[str, ...] = ("time", "startTime", "start_time", "stime", "label", "timeContent")
+SLOT_COURT_KEYS: Tuple[str, ...] = ("court", "courtNo", "court_no", "courtName", "court_name")
+
+
+def _first_truthy(t: dict, keys: Tuple[str, ...]) -> Any:
+    """
+    `t.get(k1) or t.get(k2) or ...` 와 동일 (전부 falsy면 마지막 값)
+    """
+    for k in keys:
+        v = t.get(k)
+        if v:
+            return v
+    return t.get(keys[-1])
+
+
+@lru_cache(maxsize=4096)
+def _slot_key_str(t: str) -> str:
+    # 같은 시간 문자열이 시설/날짜/알람마다 반복되므로 strip+intern 결과를 캐시
+    return sys.intern(t.strip())
+
+
+def _slot_key_dict(t: dict) -> str:
+    time_val = _first_truthy(t, SLOT_TIME_KEYS)
+    if isinstance(time_val, dict):
+        time_val = time_val.get("time") or time_val.get("label")
+    time_str = str(time_val).strip() if time_val is not None else ""
+
+    court_val = _first_truthy(t, SLOT_COURT_KEYS)
+    court_str = str(court_val).strip() if court_val is not None else ""
+
+    # 같은 "TIME|COURT" 문자열이 시설/날짜마다 반복되므로 intern해서 set 비교를 포인터 비교로
+    if court_str and time_str:
+        return sys.intern(f"{time_str}|{court_str}")
+    return sys.intern(time_str)
+
+
 def slot_key_from_time(t: Any) -> str:
     """
     tennis_core 결과 슬롯이 str이 아니라 dict로 오는 케이스 대응.
@@ -224,37 +286,17 @@ def slot_key_from_time(t: Any) -> str:
     - court / courtNo / court_name 같이 코트 구분
     최종 slot_key는 "TIME" 또는 "TIME|COURT" 형태
     """
+    tt = type(t)
+    if tt is dict:
+        return _slot_key_dict(t)
+    if tt is str:
+        return _slot_key_str(t)
     if t is None:
         return ""
     if isinstance(t, str):
-        return t.strip()
-
+        return _slot_key_str(t)
     if isinstance(t, dict):
-        time_val = (
-            t.get("time")
-            or t.get("startTime")
-            or t.get("start_time")
-            or t.get("stime")
-            or t.get("label")
-            or t.get("timeContent")
-        )
-        if isinstance(time_val, dict):
-            time_val = time_val.get("time") or time_val.get("label")
-        time_str = str(time_val).strip() if time_val is not None else ""
-
-        court_val = (
-            t.get("court")
-            or t.get("courtNo")
-            or t.get("court_no")
-            or t.get("courtName")
-            or t.get("court_name")
-        )
-        court_str = str(court_val).strip() if court_val is not None else ""
-
-        if court_str and time_str:
-            return f"{time_str}|{court_str}"
-        return time_str
-
+        return _slot_key_dict(t)
     return str(t).strip()
 
 
@@ -287,24 +329,47 @@ def slot_obj_for_frontend(t: Any, fallback_resve_id: str) -> Dict[str, Any]:
     availability_cache.slots_json에 넣을 프론트용 슬롯 객체.
     프론트는 {timeContent, resveId}를 기대.
     """
-    if isinstance(t, dict):
-        # 가능한 키를 timeContent/resveId로 정규화
-        time_content = (
-            t.get("timeContent")
-            or t.get("label")
-            or t.get("time")
-            or t.get("startTime")
-            or t.get("start_time")
-            or t.get("stime")
-        )
-        resve_id = t.get("resveId") or t.get("resve_id") or fallback_resve_id
-        obj = dict(t)
-        obj["timeContent"] = str(time_content) if time_content is not None else slot_key_from_time(t)
-        obj["resveId"] = str(resve_id) if resve_id is not None else fallback_resve_id
-        return obj
+    match t:
+        case dict():
+            # 가능한 키를 timeContent/resveId로 정규화
+            time_content = (
+                t.get("timeContent")
+                or t.get("label")
+                or t.get("time")
+                or t.get("startTime")
+                or t.get("start_time")
+                or t.get("stime")
+            )
+            resve_id = t.get("resveId") or t.get("resve_id") or fallback_resve_id
+            obj = dict(t)
+            obj["timeContent"] = str(time_content) if time_content is not None else _slot_key_dict(t)
+            obj["resveId"] = str(resve_id) if resve_id is not None else fallback_resve_id
+            return obj
+        case str():
+            return {"timeContent": _slot_key_str(t), "resveId": fallback_resve_id}
+        case _:
+            # None/기타
+            return {"timeContent": slot_key_from_time(t), "resveId": fallback_resve_id}
+
 
-    # str/기타
-    return {"timeContent": slot_key_from_time(t), "resveId": fallback_resve_id}
+@lru_cache(maxsize=100_000)
+def _slot_json_cached(items: Tuple[Tuple[str, type, Any], ...], fallback_resve_id: str) -> str:
+    return json.dumps(slot_obj_for_frontend({k: v for k, _, v in items}, fallback_resve_id), ensure_ascii=False)
+
+
+def slot_json_for_frontend(t: Any, fallback_resve_id: str) -> str:
+    """
+    slot_obj_for_frontend의 JSON 조각. 같은 슬롯 dict가 날짜/시설마다 반복되므로
+    (키, 값 타입, 값) 튜플 단위로 직렬화 결과를 재사용한다.
+    (1 / True / 1.0은 해시와 == 가 같아서 타입을 키에 넣지 않으면 서로의 캐시를 받는다)
+    """
+    if isinstance(t, dict):
+        try:
+            return _slot_json_cached(tuple((k, type(v), v) for k, v in t.items()), fallback_resve_id)
+        except TypeError:
+            # 값에 list/dict 등 해시 불가 객체가 있으면 캐시 없이 처리
+            pass
+    return json.dumps(slot_obj_for_frontend(t, fallback_resve_id), ensure_ascii=False)
 
 
 # =========================================================
@@ -343,6 +408,46 @@ create unique index if not exists uniq_alarms_subscription_court_date_time
   on public.alarms (subscription_id, court_group, date, time_mode, coalesce(time_hour, -1));
 """
 
+DEFAULT_PREPARE_THRESHOLD = 1
+
+
+def db_prepare_threshold() -> Optional[int]:
+    """
+    DB_PREPARE_THRESHOLD: 같은 쿼리를 이 횟수만큼 실행한 뒤(다음 실행부터) 서버 prepared statement로 쓴다.
+    기본 1이면 두 번째 실행부터 prepare되고, 한 번만 실행되는 문장은 prepare되지 않는다.
+    (prepare=True를 넘긴 preload 쿼리는 첫 실행부터 prepare)
+    prepared statement를 지원하지 않는 pooler(transaction 모드 등) 뒤라면 off로 끈다.
+    (off면 preload 쿼리의 prepare=True도 무시된다)
+    """
+    raw = (os.getenv("DB_PREPARE_THRESHOLD") or "").strip().lower()
+    if not raw:
+        return DEFAULT_PREPARE_THRESHOLD
+    if raw in ("off", "none", "disable", "disabled", "-1"):
+        return None
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return DEFAULT_PREPARE_THRESHOLD
+
+
+def connect_db(database_url: str) -> psycopg.Connection:
+    """
+    이 잡은 연결 1개로 순차 처리하므로 풀 대신 단일 연결을 쓰되,
+    푸시 발송 등 DB를 안 쓰는 구간에서 끊기지 않게 TCP keepalive를 켠다.
+    """
+    conn = psycopg.connect(
+        database_url,
+        connect_timeout=10,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+        application_name="refresh_and_notify",
+    )
+    conn.prepare_threshold = db_prepare_threshold()
+    return conn
+
+
 def ensure_extra_schema(conn: psycopg.Connection) -> None:
     with conn.cursor() as cur:
         cur.execute(SCHEMA_SQL)
@@ -815,7 +920,8 @@ def crawl_all() -> Tuple[Dict[str, Any], Dict[str, Dict[str, List[Any]]]]:
 # =========================================================
 def upsert_facilities_for_frontend(conn: psycopg.Connection, facilities: Dict[str, Any], commit: bool = True) -> None:
     ts = utcnow()
-    rows = []
+    # facility_id당 한 행 (multi-row VALUES 안에서 같은 키가 두 번이면 on conflict update 실패)
+    rows: Dict[str, Tuple[str, str, str, datetime]] = {}
     for fid, v in facilities.items():
         fid = str(fid)
         row_ts = ts
@@ -826,20 +932,18 @@ def upsert_facilities_for_frontend(conn: psycopg.Connection, facilities: Dict[st
         else:
             title = str(v) if v is not None else f"RID {fid}"
             location = ""
-        rows.append((fid, title, location, row_ts))
+        rows[fid] = (fid, title, location, row_ts)
 
     if not rows:
         return
 
     with conn.cursor() as cur:
-        cur.executemany(
-            """
-            insert into public.facilities (facility_id, title, location, updated_at)
-            values (%s, %s, %s, %s)
-            on conflict (facility_id)
-            do update set title=excluded.title, location=excluded.location, updated_at=excluded.updated_at
-            """,
-            rows,
+        execute_values(
+            cur,
+            "insert into public.facilities (facility_id, title, location, updated_at) values",
+            list(rows.values()),
+            "on conflict (facility_id) "
+            "do update set title=excluded.title, location=excluded.location, updated_at=excluded.updated_at",
         )
     if commit:
         conn.commit()
@@ -1058,12 +1162,14 @@ def clear_availability_cache_for_target(
     end_yyyymmdd: str,
     keep_yongin_today: bool = False,
     exclude_prefixes: Iterable[str] = (),
+    keep_keys: Iterable[Tuple[str, date]] = (),
     commit: bool = True,
 ) -> None:
     """
     타겟별로 해당 기간의 availability_cache를 빈 배열로 초기화한다.
     - DELETE가 아니라 slots_json='[]'로 초기화 (충돌/외래키 안전)
     - target: yongin | goyang | suwon | seongnam | anyang | paju | all
+    - keep_keys: 곧바로 upsert로 다시 쓸 (facility_id, date_ymd)는 비우지 않는다
     """
     target = (target or "all").strip().lower()
 
@@ -1115,6 +1221,16 @@ def clear_availability_cache_for_target(
         if keep_yongin_today:
             params.append("yongin:%")
             params.append(today_d)
+        keep_keys = list(keep_keys)
+        keep_guard = ""
+        if keep_keys:
+            keep_guard = """ and not exists (
+                select 1 from unnest(%s::text[], %s::date[]) as k(facility_id, date_ymd)
+                 where k.facility_id = availability_cache.facility_id
+                   and k.date_ymd = availability_cache.date_ymd
+               )"""
+            params.append([k[0] for k in keep_keys])
+            params.append([k[1] for k in keep_keys])
         cur.execute(
             f"""
             update public.availability_cache
@@ -1123,12 +1239,48 @@ def clear_availability_cache_for_target(
              where date_ymd between %s and %s
                and ({where})
                {extra_guard}
+               {keep_guard}
+               and slots_json <> '[]'::jsonb
             """,
             tuple(params),
         )
     if commit:
         conn.commit()
 
+
+def copy_to_stage(cur: psycopg.Cursor, stage: str, columns: List[Tuple[str, str]], rows: Iterable[tuple]) -> None:
+    """
+    트랜잭션 임시 테이블(on commit drop)에 binary COPY로 적재한다.
+    (date/timestamptz 등을 문자열로 만들었다가 서버에서 다시 파싱하지 않음)
+    columns: [(컬럼명, 타입), ...] - 타입은 binary dumper를 고르는 데도 쓰인다
+    """
+    col_defs = ", ".join(f"{name} {typ}" for name, typ in columns)
+    col_names = ", ".join(name for name, _ in columns)
+    cur.execute(f"create temp table if not exists {stage} ({col_defs}) on commit drop")
+    cur.execute(f"truncate {stage}")
+    with cur.copy(f"copy {stage} ({col_names}) from stdin (format binary)") as cp:
+        cp.set_types([typ for _, typ in columns])
+        for row in rows:
+            cp.write_row(row)
+
+
+# slots_json은 이미 직렬화된 JSON 문자열이라 stage에는 text로 싣고 insert 때 jsonb로 캐스트
+# (binary COPY에서 str을 jsonb로 보내면 JSON 문자열 리터럴로 한 번 더 감싸진다)
+STAGE_AVAILABILITY_COLUMNS = [
+    ("facility_id", "text"),
+    ("date_ymd", "date"),
+    ("slots_json", "text"),
+    ("updated_at", "timestamptz"),
+]
+STAGE_SENT_COLUMNS = [("subscription_id", "text"), ("slot_key", "text")]
+STAGE_SNAPSHOT_COLUMNS = [
+    ("facility_id", "text"),
+    ("date_ymd", "date"),
+    ("slot_key", "text"),
+    ("is_new", "boolean"),
+]
+
+
 def upsert_availability_cache_for_frontend(
     conn: psycopg.Connection,
     facilities: Dict[str, Any],
@@ -1141,7 +1293,8 @@ def upsert_availability_cache_for_frontend(
     slots_json은 [{"timeContent":"..","resveId":".."}, ...]
     """
     ts = utcnow()
-    rows = []
+    # (facility_id, date_ymd) 당 한 행 (같은 키가 두 번이면 on conflict update가 실패하므로 마지막 값 유지)
+    rows: Dict[Tuple[str, date], Tuple[str, date, str, datetime]] = {}
 
     today_ymd = kst_today_yyyymmdd()
 
@@ -1164,21 +1317,31 @@ def upsert_availability_cache_for_frontend(
             # 최소한 "시설 id로 링크 생성"도 가능하게 fallback 처리
             fallback_resve_id = _strip_yongin_resve_id(fid)
 
-            arr = [slot_obj_for_frontend(s, fallback_resve_id) for s in (slots or []) if slot_key_from_time(s)]
-            rows.append((fid, d, json.dumps(arr, ensure_ascii=False), row_ts))
+            # json.dumps(list)와 같은 ", " 구분자로 조각을 이어 붙인다
+            arr = ", ".join(
+                slot_json_for_frontend(s, fallback_resve_id) for s in (slots or []) if slot_key_from_time(s)
+            )
+            rows[(fid, d)] = (fid, d, f"[{arr}]", row_ts)
 
     if not rows:
         return
 
     with conn.cursor() as cur:
-        cur.executemany(
+        copy_to_stage(cur, "stage_availability", STAGE_AVAILABILITY_COLUMNS, rows.values())
+        cur.execute(
             """
             insert into public.availability_cache (facility_id, date_ymd, slots_json, updated_at)
-            values (%s, %s, %s::jsonb, %s)
+            select facility_id, date_ymd, slots_json::jsonb, updated_at
+            from stage_availability
             on conflict (facility_id, date_ymd)
-            do update set slots_json=excluded.slots_json, updated_at=excluded.updated_at
-            """,
-            rows,
+            do update set
+              -- 내용이 같으면 기존 jsonb(TOAST)를 그대로 두고 updated_at만 갱신
+              slots_json = case
+                when availability_cache.slots_json is distinct from excluded.slots_json then excluded.slots_json
+                else availability_cache.slots_json
+              end,
+              updated_at = excluded.updated_at
+            """
         )
     if commit:
         conn.commit()
@@ -1189,42 +1352,35 @@ def upsert_availability_cache_for_frontend(
 # =========================================================
 # DB read (batch)
 # =========================================================
-def load_push_subscriptions(conn: psycopg.Connection, sub_ids: List[str]) -> Dict[str, dict]:
+def load_alarms(conn: psycopg.Connection) -> List[dict]:
     """
-    push_subscriptions: id(subscription_id) -> pywebpush subscription_info
+    alarms: subscription_id, court_group, date(text), optional time condition
+    push_subscriptions를 같이 join해서 endpoint/p256dh/auth도 한 번에 가져온다
+    (구독이 없는 알람은 endpoint가 null)
     """
-    if not sub_ids:
-        return {}
     with conn.cursor(row_factory=dict_row) as cur:
         cur.execute(
             """
-            select id, endpoint, p256dh, auth
-            from public.push_subscriptions
-            where id = any(%s)
+            select a.subscription_id, a.court_group, a.date, a.time_mode, a.time_hour,
+                   p.endpoint, p.p256dh, p.auth
+            from public.alarms a
+            left join public.push_subscriptions p on p.id = a.subscription_id
             """,
-            (sub_ids,),
+            prepare=True,
         )
-        rows = cur.fetchall()
-
-    m = {}
-    for r in rows:
-        sid = r["id"]
-        m[sid] = {"endpoint": r["endpoint"], "keys": {"p256dh": r["p256dh"], "auth": r["auth"]}}
-    return m
+        return cur.fetchall()
 
 
-def load_alarms(conn: psycopg.Connection) -> List[dict]:
+def push_map_from_alarms(alarms: List[dict]) -> Dict[str, dict]:
     """
-    alarms: subscription_id, court_group, date(text), optional time condition
+    load_alarms 결과에서 subscription_id -> pywebpush subscription_info
     """
-    with conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(
-            """
-            select subscription_id, court_group, date, time_mode, time_hour
-            from public.alarms
-            """
-        )
-        return cur.fetchall()
+    m = {}
+    for r in alarms:
+        sid = r.get("subscription_id")
+        if sid and r.get("endpoint") and sid not in m:
+            m[sid] = {"endpoint": r["endpoint"], "keys": {"p256dh": r["p256dh"], "auth": r["auth"]}}
+    return m
 
 
 def cleanup_expired_alarms(conn: psycopg.Connection) -> int:
@@ -1247,6 +1403,42 @@ def cleanup_expired_alarms(conn: psycopg.Connection) -> int:
     return deleted
 
 
+# 푸시 서비스가 이 상태 코드를 주면 구독이 만료/해지된 것이라 재시도해도 소용없다
+DEAD_PUSH_STATUS = frozenset({404, 410})
+
+
+def delete_dead_subscriptions(conn: psycopg.Connection, sub_ids: Iterable[str], commit: bool = True) -> Tuple[int, int]:
+    """
+    만료된 구독(404/410)과 그 구독의 알람을 한 번에 삭제한다.
+    return: (deleted_subscriptions, deleted_alarms)
+    """
+    sub_ids = sorted(set(sub_ids))
+    if not sub_ids:
+        return 0, 0
+    with conn.cursor() as cur:
+        cur.execute("delete from public.alarms where subscription_id = any(%s)", (sub_ids,))
+        deleted_alarms = cur.rowcount or 0
+        cur.execute("delete from public.push_subscriptions where id = any(%s)", (sub_ids,))
+        deleted_subs = cur.rowcount or 0
+    if commit:
+        conn.commit()
+    return deleted_subs, deleted_alarms
+
+
+FETCH_BATCH_ROWS = 10_000
+
+
+def iter_rows(cur: psycopg.Cursor, size: int = FETCH_BATCH_ROWS) -> Iterable[tuple]:
+    """
+    fetchall 대신 size행씩 받아서 큰 결과도 피크 메모리를 제한한다.
+    """
+    while True:
+        batch = cur.fetchmany(size)
+        if not batch:
+            return
+        yield from batch
+
+
 def preload_baseline(conn: psycopg.Connection, keys: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], Set[str]]:
     """
     baseline_slots: subscription_id, court_group, date(char/text), time_content
@@ -1261,7 +1453,7 @@ def preload_baseline(conn: psycopg.Connection, keys: List[Tuple[str, str, str]])
     groups = [k[1] for k in keys]
     dates = [k[2] for k in keys]
 
-    with conn.cursor(row_factory=dict_row) as cur:
+    with conn.cursor() as cur:
         cur.execute(
             """
             with q as (
@@ -1276,106 +1468,242 @@ def preload_baseline(conn: psycopg.Connection, keys: List[Tuple[str, str, str]])
              and q.date = b.date
             """,
             (sub_ids, groups, dates),
+            prepare=True,
         )
-        rows = cur.fetchall()
+        m: Dict[Tuple[str, str, str], Set[str]] = defaultdict(set)
+        for sid, group, ymd, time_content in iter_rows(cur):
+            m[(sid, group, ymd)].add(time_content)
+    return dict(m)
 
-    m: Dict[Tuple[str, str, str], Set[str]] = {}
-    for r in rows:
-        key = (r["subscription_id"], r["court_group"], r["date"])
-        m.setdefault(key, set()).add(r["time_content"])
-    return m
+
+VALUES_CHUNK_ROWS = 1000
 
 
-def insert_baseline(conn: psycopg.Connection, sub_id: str, court_group: str, ymd: str, slot_keys: Iterable[str]) -> None:
+def execute_values(
+    cur: psycopg.Cursor,
+    head_sql: str,
+    rows: List[tuple],
+    tail_sql: str = "",
+    row_template: Optional[str] = None,
+    chunk: int = VALUES_CHUNK_ROWS,
+) -> None:
+    """
+    rows를 multi-row VALUES 한 문장으로 묶어 실행 (chunk행마다 1 round-trip)
+    head_sql은 "... values" 까지, tail_sql은 on conflict 절.
+    """
+    if not rows:
+        return
+    row_ph = row_template or "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+    for i in range(0, len(rows), chunk):
+        part = rows[i:i + chunk]
+        cur.execute(
+            f"{head_sql} {', '.join([row_ph] * len(part))} {tail_sql}",
+            [v for row in part for v in row],
+        )
+
+
+def bulk_insert_baseline(conn: psycopg.Connection, baseline_rows: List[Tuple[str, str, str, str]], commit: bool = True) -> None:
     """
     baseline_slots에 현재 슬롯을 baseline으로 박아 넣음.
     (첫 실행/첫 알람 등록 시 기존 슬롯은 알림 안 보내기용)
+    baseline_rows: [(subscription_id, court_group, yyyymmdd, time_content), ...]
     """
-    rows = []
-    for sk in slot_keys:
-        if not sk:
-            continue
-        rows.append((sub_id, court_group, ymd, sk))
-
+    rows = [r for r in baseline_rows if r[3]]
     if not rows:
         return
 
     with conn.cursor() as cur:
-        cur.executemany(
-            """
-            insert into public.baseline_slots (subscription_id, court_group, date, time_content)
-            values (%s, %s, %s, %s)
-            on conflict do nothing
-            """,
+        execute_values(
+            cur,
+            "insert into public.baseline_slots (subscription_id, court_group, date, time_content) values",
             rows,
+            "on conflict do nothing",
         )
-    conn.commit()
+    if commit:
+        conn.commit()
 
 
-def preload_sent_slots(conn: psycopg.Connection, sub_ids: List[str], slot_keys: List[str]) -> Dict[str, Set[str]]:
+def preload_sent_slots(conn: psycopg.Connection, pairs: List[Tuple[str, str]]) -> Dict[str, Set[str]]:
     """
     sent_slots: subscription_id, slot_key
-    한번에 preload해서 per-user DB hit 제거
+    실제 발송 후보인 (subscription_id, slot_key) 쌍만 UNNEST로 join해서 한 번에 preload
+    (subscription_id = any × slot_key = any 교차곱으로 무관한 행까지 읽지 않게)
     """
-    if not sub_ids or not slot_keys:
-        return {sid: set() for sid in sub_ids}
+    if not pairs:
+        return {}
 
-    with conn.cursor(row_factory=dict_row) as cur:
+    m: Dict[str, Set[str]] = defaultdict(set)
+    with conn.cursor() as cur:
         cur.execute(
             """
-            select subscription_id, slot_key
-            from public.sent_slots
-            where subscription_id = any(%s)
-              and slot_key = any(%s)
+            select s.subscription_id, s.slot_key
+            from public.sent_slots s
+            join unnest(%s::text[], %s::text[]) as q(subscription_id, slot_key)
+              on s.subscription_id = q.subscription_id
+             and s.slot_key = q.slot_key
             """,
-            (sub_ids, slot_keys),
+            ([p[0] for p in pairs], [p[1] for p in pairs]),
+            prepare=True,
         )
-        rows = cur.fetchall()
-
-    m: Dict[str, Set[str]] = {sid: set() for sid in sub_ids}
-    for r in rows:
-        m.setdefault(r["subscription_id"], set()).add(r["slot_key"])
-    return m
+        for sid, slot_key in iter_rows(cur):
+            m[sid].add(slot_key)
+    return dict(m)
 
 
-def bulk_mark_sent(conn: psycopg.Connection, sent_rows: List[Tuple[str, str]]) -> None:
+def bulk_mark_sent(conn: psycopg.Connection, sent_rows: List[Tuple[str, str]], commit: bool = True) -> int:
     """
     sent_slots bulk insert
     sent_rows: [(subscription_id, slot_key), ...]
+    이미 기록된 키는 on conflict do nothing으로 건너뛰고 실제 새로 들어간 행 수를 반환
     """
     if not sent_rows:
-        return
+        return 0
+    # 중복은 COPY 전에 클라이언트에서 제거하고, PK 순서로 정렬해 인덱스 삽입 위치를 모은다
+    rows = sorted(set(sent_rows))
     with conn.cursor() as cur:
-        cur.executemany(
+        copy_to_stage(cur, "stage_sent", STAGE_SENT_COLUMNS, rows)
+        cur.execute(
             """
             insert into public.sent_slots (subscription_id, slot_key, sent_at)
-            values (%s, %s, now())
+            select s.subscription_id, s.slot_key, now()
+            from stage_sent s
             on conflict do nothing
+            """
+        )
+        inserted = cur.rowcount or 0
+    if commit:
+        conn.commit()
+    return inserted
+
+
+def preload_slots_snapshot(conn: psycopg.Connection, pairs: List[Tuple[str, date]]) -> Dict[Tuple[str, date], Set[str]]:
+    """
+    이번 크롤에 실제로 있는 (facility_id, date_ymd) 조합만 slots_snapshot에서 읽어온다.
+    (facility_id = any × date_ymd = any 의 교차곱 대신 UNNEST 쌍 join)
+    """
+    if not pairs:
+        return {}
+    fids = [p[0] for p in pairs]
+    dates = [p[1] for p in pairs]
+    m: Dict[Tuple[str, date], Set[str]] = defaultdict(set)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            with q as (
+              select * from unnest(%s::text[], %s::date[]) as t(facility_id, date_ymd)
+            )
+            select s.facility_id, s.date_ymd, s.slot_key
+            from public.slots_snapshot s
+            join q
+              on q.facility_id = s.facility_id
+             and q.date_ymd = s.date_ymd
             """,
-            sent_rows,
+            (fids, dates),
+            prepare=True,
         )
-    conn.commit()
+        for fid, d, sk in iter_rows(cur):
+            m[(fid, d)].add(sk)
+    return dict(m)
+
+
+# last_seen_at이 이 간격 안에 갱신된 행은 다시 쓰지 않는다 (매 실행마다 전 행 update 방지)
+SNAPSHOT_TOUCH_INTERVAL = timedelta(minutes=10)
 
 
-def bulk_upsert_slots_snapshot(conn: psycopg.Connection, snapshot_rows: List[Tuple[str, date, str]]) -> None:
+def bulk_upsert_slots_snapshot(
+    conn: psycopg.Connection,
+    snapshot_rows: List[Tuple[str, date, str]],
+    existing: Optional[Dict[Tuple[str, date], Set[str]]] = None,
+    commit: bool = True,
+) -> None:
     """
     slots_snapshot: facility_id, date_ymd, slot_key
     (first_seen_at/last_seen_at 갱신)
+    existing(preload_slots_snapshot 결과)이 있으면 새 키만 insert하고
+    이미 있는 키는 last_seen_at이 SNAPSHOT_TOUCH_INTERVAL보다 오래된 것만 update한다.
     """
     if not snapshot_rows:
         return
     ts = utcnow()
+    existing = existing or {}
+    # 한 insert 안에 같은 키가 두 번 있으면 on conflict do update가 실패하므로 중복 제거
+    # ts는 행마다 싣지 않고 insert/update 문에 파라미터 한 번으로 넘긴다
+    rows = [
+        (fid, d, sk, sk not in existing.get((fid, d), ()))
+        for (fid, d, sk) in dict.fromkeys(snapshot_rows)
+    ]
     with conn.cursor() as cur:
-        cur.executemany(
+        copy_to_stage(cur, "stage_snapshot", STAGE_SNAPSHOT_COLUMNS, rows)
+        cur.execute(
             """
             insert into public.slots_snapshot (facility_id, date_ymd, slot_key, first_seen_at, last_seen_at)
-            values (%s, %s, %s, %s, %s)
+            select facility_id, date_ymd, slot_key, %(ts)s, %(ts)s
+            from stage_snapshot
+            where is_new
             on conflict (facility_id, date_ymd, slot_key)
             do update set last_seen_at = excluded.last_seen_at
             """,
-            [(fid, d, sk, ts, ts) for (fid, d, sk) in snapshot_rows],
+            {"ts": ts},
         )
-    conn.commit()
+        cur.execute(
+            """
+            update public.slots_snapshot t
+               set last_seen_at = %s
+              from stage_snapshot s
+             where not s.is_new
+               and t.facility_id = s.facility_id
+               and t.date_ymd = s.date_ymd
+               and t.slot_key = s.slot_key
+               and t.last_seen_at < %s
+            """,
+            (ts, ts - SNAPSHOT_TOUCH_INTERVAL),
+        )
+    if commit:
+        conn.commit()
+
+
+def bulk_touch_slots_snapshot(conn: psycopg.Connection, pairs: List[Tuple[str, date]], commit: bool = True) -> None:
+    """
+    슬롯 구성이 바뀌지 않은 (facility_id, date_ymd)의 last_seen_at만 한 번에 갱신
+    (SNAPSHOT_TOUCH_INTERVAL 안에 이미 갱신된 행은 건너뜀)
+    """
+    if not pairs:
+        return
+    ts = utcnow()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            update public.slots_snapshot s
+               set last_seen_at = %s
+              from unnest(%s::text[], %s::date[]) as q(facility_id, date_ymd)
+             where s.facility_id = q.facility_id
+               and s.date_ymd = q.date_ymd
+               and s.last_seen_at < %s
+            """,
+            (ts, [p[0] for p in pairs], [p[1] for p in pairs], ts - SNAPSHOT_TOUCH_INTERVAL),
+        )
+    if commit:
+        conn.commit()
+
+
+
+def split_snapshot_pairs(
+    snapshot_by_pair: Dict[Tuple[str, date], Set[str]],
+    existing: Dict[Tuple[str, date], Set[str]],
+) -> Tuple[List[Tuple[str, date, str]], List[Tuple[str, date]]]:
+    """
+    이번 크롤의 (facility_id, date_ymd)별 slot_key 집합을 기존 스냅샷과 비교해 나눈다.
+    return: (upsert할 snapshot_rows, last_seen_at만 갱신할 touched_pairs)
+    - 키 집합이 그대로면 touch 대상, 하나라도 다르면 그 쌍의 키 전부를 upsert 대상으로
+    """
+    snapshot_rows: List[Tuple[str, date, str]] = []
+    touched_pairs: List[Tuple[str, date]] = []
+    for (fid, d), keys in snapshot_by_pair.items():
+        if keys == existing.get((fid, d)):
+            touched_pairs.append((fid, d))
+        else:
+            snapshot_rows.extend((fid, d, sk) for sk in keys)
+    return snapshot_rows, touched_pairs
 
 def compute_minmax_yyyymmdd(availability: Dict[str, Dict[str, List[Any]]]) -> Tuple[str, str] | None:
     ys = []
@@ -1407,17 +1735,124 @@ def should_protect_cache(slot_count: int, partial_failure: bool = False, protect
 # =========================================================
 # Push
 # =========================================================
-def send_push(subscription_info: dict, title: str, body: str) -> None:
-    vapid_private = os.environ["VAPID_PRIVATE_KEY"]
-    vapid_subject = os.environ["VAPID_SUBJECT"]
+PUSH_WORKERS = 32
+
+
+def push_concurrency() -> int:
+    """
+    PUSH_CONCURRENCY 환경변수로 동시 발송 수 조절 (1~64, 기본 PUSH_WORKERS)
+    """
+    try:
+        value = int((os.getenv("PUSH_CONCURRENCY") or str(PUSH_WORKERS)).strip())
+    except ValueError:
+        value = PUSH_WORKERS
+    return max(1, min(value, 64))
+
+
+def make_push_session(pool_size: int = PUSH_WORKERS) -> requests.Session:
+    """
+    푸시 엔드포인트(FCM/Mozilla 등) 연결을 스레드 간에 재사용하기 위한 세션
+    """
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+PUSH_TITLE = "🎾 예약 오픈"
+PUSH_PREVIEW_SLOTS = 6
+PUSH_PREVIEW_ITEMS = 6
+PushItem = Dict[str, Any]  # {group, ymd, mode, hour, baseline_group, slots}
+
+
+def build_push_body(items: List[PushItem]) -> str:
+    """
+    한 사용자에게 보낼 알림 본문. 알람 1건이면 기존 형식 그대로,
+    여러 건이면 날짜/코트그룹 순으로 한 줄씩 (최대 PUSH_PREVIEW_ITEMS줄) 묶는다.
+    """
+    def _line(item: PushItem, n_slots: int) -> str:
+        slots = item["slots"]
+        ymd = item["ymd"]
+        # 전체를 정렬하지 않고 앞쪽 n_slots개만 골라 정렬
+        preview = ", ".join(heapq.nsmallest(n_slots, slots))
+        more = "" if len(slots) <= n_slots else f" 외 {len(slots) - n_slots}개"
+        condition = time_condition_label(item["mode"], item["hour"])
+        return f"{item['group']} {ymd[4:6]}/{ymd[6:8]} {condition} 신규 슬롯: {preview}{more}"
+
+    if len(items) == 1:
+        return _line(items[0], PUSH_PREVIEW_SLOTS)
+
+    ordered = sorted(items, key=lambda it: (it["ymd"], it["group"]))
+    lines = [_line(item, 3) for item in ordered[:PUSH_PREVIEW_ITEMS]]
+    if len(ordered) > PUSH_PREVIEW_ITEMS:
+        lines.append(f"외 {len(ordered) - PUSH_PREVIEW_ITEMS}건")
+    return "\n".join(lines)
+
+
+# VAPID JWT는 push 서비스 origin(aud)별로 12시간 유효하므로 서명 결과를 재사용한다.
+VAPID_EXP_S = 12 * 60 * 60
+VAPID_REFRESH_MARGIN_S = 10 * 60
+_VAPID_LOCK = threading.Lock()
+_VAPID_SIGNER: Optional[Tuple[str, Vapid]] = None
+_VAPID_HEADERS: Dict[Tuple[str, str], Tuple[Dict[str, str], float]] = {}
+
+
+def _vapid_signer(private_key: str) -> Vapid:
+    global _VAPID_SIGNER
+    if _VAPID_SIGNER is None or _VAPID_SIGNER[0] != private_key:
+        if os.path.isfile(private_key):
+            vv = Vapid.from_file(private_key_file=private_key)
+        else:
+            vv = Vapid.from_string(private_key=private_key)
+        _VAPID_SIGNER = (private_key, vv)
+    return _VAPID_SIGNER[1]
+
+
+def vapid_headers_for(endpoint: str, private_key: str, subject: str) -> Dict[str, str]:
+    """
+    endpoint origin별 VAPID Authorization 헤더 (만료 10분 전까지 캐시 재사용)
+    """
+    url = urlparse(endpoint)
+    aud = f"{url.scheme}://{url.netloc}"
+    now = time.time()
+    with _VAPID_LOCK:
+        cached = _VAPID_HEADERS.get((aud, subject))
+        if cached and cached[1] - now > VAPID_REFRESH_MARGIN_S:
+            return dict(cached[0])
+        exp = int(now) + VAPID_EXP_S
+        headers = _vapid_signer(private_key).sign({"sub": subject, "aud": aud, "exp": exp})
+        _VAPID_HEADERS[(aud, subject)] = (headers, exp)
+        return dict(headers)
+
+
+@lru_cache(maxsize=1)
+def vapid_credentials() -> Tuple[str, str]:
+    """
+    (VAPID_PRIVATE_KEY, VAPID_SUBJECT) - 프로세스 안에서 바뀌지 않으므로 처음 한 번만 읽는다
+    (import 시점에 읽지 않는 건 env 없이도 모듈을 import할 수 있게 하기 위함)
+    """
+    return os.environ["VAPID_PRIVATE_KEY"], os.environ["VAPID_SUBJECT"]
+
+
+def send_push(subscription_info: dict, title: str, body: str, session: Optional[requests.Session] = None) -> None:
+    vapid_private, vapid_subject = vapid_credentials()
     payload = json.dumps({"title": title, "body": body}, ensure_ascii=False)
 
-    webpush(
-        subscription_info=subscription_info,
-        data=payload,
-        vapid_private_key=vapid_private,
-        vapid_claims={"sub": vapid_subject},
+    # webpush()는 호출마다 키 파싱 + ECDSA 서명을 하므로 캐시된 헤더로 WebPusher를 직접 쓴다
+    headers = vapid_headers_for(subscription_info.get("endpoint") or "", vapid_private, vapid_subject)
+    response = WebPusher(subscription_info, requests_session=session).send(
+        payload,
+        headers,
+        ttl=0,
+        content_encoding="aes128gcm",
+        timeout=None,
     )
+    if response.status_code > 202:
+        raise WebPushException(
+            f"Push failed: {response.status_code} {response.reason}\nResponse body:{response.text}",
+            response=response,
+        )
 
 
 # =========================================================
@@ -1436,6 +1871,7 @@ def main() -> None:
     # 결과 누적(마지막에 bulk flush)
     snapshot_rows: List[Tuple[str, date, str]] = []   # (facility_id, date_ymd, slot_key)
     sent_rows: List[Tuple[str, str]] = []            # (subscription_id, slot_key)
+    baseline_rows: List[Tuple[str, str, str, str]] = []  # (subscription_id, court_group, yyyymmdd, time_content)
 
     # 1) Crawl before opening Supabase connection so long city crawls do not idle-timeout DB sessions.
     facilities, availability = crawl_all()
@@ -1533,11 +1969,12 @@ def main() -> None:
             k: v for k, v in availability_for_write.items()
             if not any(str(k).startswith(prefix) for prefix in LAST_FAILED_PREFIXES)
         }
-    with psycopg.connect(database_url) as conn:
+    with connect_db(database_url) as conn:
         # Frontend tables and alarm housekeeping are DB work, so run them after crawling.
         ensure_extra_schema(conn)
         purge_blocked_frontend_prefixes(conn, commit=False)
         cleanup_tracking_tables(conn, commit=False)
+        # 만료 알람 삭제는 뒤의 저장/flush 실패와 무관하게 남도록 여기서 바로 커밋
         deleted_alarms = cleanup_expired_alarms(conn)
         if deleted_alarms:
             print(f"[ALARMS] expired deleted={deleted_alarms} (KST<{kst_today_yyyymmdd()})")
@@ -1553,6 +1990,12 @@ def main() -> None:
                 end_ymd,
                 keep_yongin_today=(clear_target in ("all", "yongin")),
                 exclude_prefixes=excluded_cache_prefixes,
+                keep_keys=[
+                    (str(fid), yyyymmdd_to_date(ymd))
+                    for fid, day_map in availability_for_write.items()
+                    for ymd in (day_map or {})
+                    if ymd and len(ymd) == 8
+                ],
                 commit=False,
             )
         else:
@@ -1599,15 +2042,14 @@ def main() -> None:
             print("[SUMMARY] alarms=0 (no work)")
             return
 
-        # 4) subscription_id 목록 -> push_subscriptions preload
-        sub_ids = sorted({str(a["subscription_id"]) for a in alarms if a.get("subscription_id")})
-        push_map = load_push_subscriptions(conn, sub_ids)
+        # 4) 알람 조회 때 같이 join한 push_subscriptions -> subscription_info
+        push_map = push_map_from_alarms(alarms)
 
         # 5) alarms를 정규화한다. baseline은 시간 조건별로 분리해 새 알람의 오탐을 막는다.
         alarm_records: List[dict] = []
         alarm_keys: List[Tuple[str, str, str]] = []
         for a in alarms:
-            sid = str(a["subscription_id"])
+            sid = a["subscription_id"]
             group = (a.get("court_group") or "").strip()
             ymd = to_yyyymmdd(a.get("date") or "")
             mode, hour = normalize_time_condition(a.get("time_mode"), a.get("time_hour"))
@@ -1626,19 +2068,24 @@ def main() -> None:
         baseline_map = preload_baseline(conn, alarm_keys)
 
         # 7) court_group별로, 해당 날짜 슬롯을 빠르게 모으기 위한 인덱스
-        # group -> facility_ids
-        group_to_fids: Dict[str, List[str]] = {}
+        # group -> [day_map, ...] (시설 id 변환/availability 조회는 여기서 한 번만)
+        group_to_day_maps: Dict[str, List[Dict[str, List[Any]]]] = defaultdict(list)
         for fid, meta in facilities.items():
             fid = str(fid)
+            day_map = availability.get(fid)
+            if not day_map:
+                continue
             title = meta.get("title") if isinstance(meta, dict) else str(meta)
             g = get_court_group(title, fid)
-            group_to_fids.setdefault(g, []).append(fid)
+            group_to_day_maps[g].append(day_map)
 
         # 8) 모든 알람에서 "현재 슬롯 후보(slot_key)"를 먼저 모아서
         #    sent_slots를 한번에 preload 하기 위한 candidate set 생성
         #    (sent_slots preload는 subscription_id+slot_key 조합을 batch로 한 번에)
-        key_to_current_slots: Dict[Tuple[str, str, str], Set[str]] = {}
-        all_candidate_slot_keys: Set[str] = set()
+        key_to_current_slots: Dict[Tuple[str, str, str], frozenset] = {}
+        sent_candidates: Set[Tuple[str, str]] = set()
+        # 같은 코트그룹/날짜/시간조건 알람은 여러 사용자가 공유하므로 슬롯 스캔은 조합당 한 번
+        condition_slots: Dict[Tuple[str, str, str, Optional[int]], frozenset] = {}
 
         for alarm in alarm_records:
             sid = alarm["sid"]
@@ -1647,34 +2094,40 @@ def main() -> None:
             mode = alarm["mode"]
             hour = alarm["hour"]
             baseline_group = alarm["baseline_group"]
-            fids = group_to_fids.get(group, [])
             current_key = (sid, baseline_group, ymd)
-            if not fids:
-                key_to_current_slots[current_key] = set()
-                continue
-
-            cur_slots: Set[str] = set()
-            for fid in fids:
-                day_map = availability.get(str(fid)) or {}
-                slots = day_map.get(ymd) or []
-                for t in slots:
-                    if not slot_matches_time_condition(t, mode, hour):
-                        continue
-                    sk = slot_key_from_time(t)
-                    if sk:
-                        cur_slots.add(sk)
-
-                        all_candidate_slot_keys.add(sent_slot_key(baseline_group, ymd, sk))
-
+            condition_key = (group, ymd, mode, hour)
+            cur_slots = condition_slots.get(condition_key)
+            if cur_slots is None:
+                found: Set[str] = set()
+                for day_map in group_to_day_maps.get(group) or ():
+                    for t in day_map.get(ymd) or ():
+                        if not slot_matches_time_condition(t, mode, hour):
+                            continue
+                        sk = slot_key_from_time(t)
+                        if sk:
+                            found.add(sk)
+                # 이후로는 읽기만 하므로 frozenset으로 고정해 알람 간에 복사 없이 공유
+                cur_slots = condition_slots[condition_key] = frozenset(found) if found else EMPTY_SLOTS
             key_to_current_slots[current_key] = cur_slots
 
-        # 9) sent_slots preload (한 번에)
-        sent_map = preload_sent_slots(conn, sub_ids, sorted(all_candidate_slot_keys))
+            # 발송 후보는 푸시 구독이 있고 baseline에 없는 슬롯뿐
+            baseline = baseline_map.get(current_key)
+            if baseline and sid in push_map:
+                sent_candidates.update(
+                    (sid, sent_slot_key(baseline_group, ymd, sk)) for sk in cur_slots - baseline
+                )
+
+        # 9) sent_slots preload (한 번에, 발송 후보 쌍만)
+        sent_map: Dict[str, Set[str]] = defaultdict(set, preload_sent_slots(conn, sorted(sent_candidates)))
 
         # 10) 알림 처리
+        #     알람별 신규 슬롯을 구독(sid)별로 모아 사용자당 푸시 1건으로 보낸다.
+        #     푸시는 엔드포인트별 HTTPS 요청이라 스레드풀로 동시에 보내고,
+        #     성공한 것만 모아서 sent_slots에 기록한다.
         push_requests = 0
         baseline_inserts = 0
         added_total = 0
+        pending: Dict[str, List[PushItem]] = defaultdict(list)
 
         for alarm in alarm_records:
             sid = alarm["sid"]
@@ -1684,20 +2137,19 @@ def main() -> None:
             hour = alarm["hour"]
             baseline_group = alarm["baseline_group"]
             base_key = (sid, baseline_group, ymd)
-            cur_slots = key_to_current_slots.get(base_key, set())
+            cur_slots = key_to_current_slots.get(base_key, EMPTY_SLOTS)
 
             # push 구독이 없으면 스킵
-            sub_info = push_map.get(sid)
-            if not sub_info:
+            if sid not in push_map:
                 continue
 
             # baseline이 없다면: "첫 실행"으로 보고 baseline 저장 후 알림 스킵
             baseline = baseline_map.get(base_key)
             if not baseline:
                 if cur_slots:
-                    insert_baseline(conn, sid, baseline_group, ymd, cur_slots)
+                    baseline_rows.extend((sid, baseline_group, ymd, sk) for sk in cur_slots)
                     baseline_inserts += 1
-                    baseline_map[base_key] = set(cur_slots)
+                    baseline_map[base_key] = cur_slots
                 continue
 
             # baseline 이후 신규 슬롯 = cur - baseline
@@ -1706,63 +2158,120 @@ def main() -> None:
                 continue
 
             # 이미 보낸 슬롯 제외
-            already_sent = sent_map.get(sid, set())
+            already_sent = sent_map.get(sid, EMPTY_SLOTS)
+            # 순서는 미리보기에서만 필요하므로 여기서는 정렬하지 않는다
             to_send = [
-                sk for sk in sorted(added)
+                sk for sk in added
                 if sent_slot_key(baseline_group, ymd, sk) not in already_sent
             ]
             if not to_send:
                 continue
 
-            # 푸시 메시지 구성
-            # 너무 길면 잘라서 요약
-            preview = ", ".join(to_send[:6])
-            more = "" if len(to_send) <= 6 else f" 외 {len(to_send)-6}개"
+            pending[sid].append(
+                {"group": group, "ymd": ymd, "mode": mode, "hour": hour, "baseline_group": baseline_group, "slots": to_send}
+            )
 
-            title = "🎾 예약 오픈"
-            condition = time_condition_label(mode, hour)
-            body = f"{group} {ymd[4:6]}/{ymd[6:8]} {condition} 신규 슬롯: {preview}{more}"
+            # 같은 실행 안에서 중복 발송 방지 (DB 기록은 발송 성공 후)
+            sent_map[sid].update(sent_slot_key(baseline_group, ymd, sk) for sk in to_send)
+
+        push_workers = push_concurrency()
+        push_session = make_push_session(push_workers)
+        push_jobs: Dict[Future, Tuple[str, List[PushItem]]] = {}
+        dead_sids: Set[str] = set()
+
+        # 푸시 HTTP 요청이 워커 스레드에서 나가는 동안 메인 스레드는 11) snapshot 준비(DB)를 먼저 한다
+        # (DB 연결은 메인 스레드만 쓰고, 워커는 HTTP만 쓴다)
+        # 예외가 나도 풀은 종료(대기)하고 세션은 닫히도록 with로 묶는다
+        with push_session, ThreadPoolExecutor(max_workers=push_workers) as push_pool:
+            for sid, items in pending.items():
+                fut = push_pool.submit(send_push, push_map[sid], PUSH_TITLE, build_push_body(items), push_session)
+                push_jobs[fut] = (sid, items)
+
+            # 11) slots_snapshot 갱신(시설/날짜 단위로는 availability 기준으로 계속 갱신)
+            #     (이 테이블은 “원본 슬롯 변화 기록” 용도라 alarms와 별개로 유지 가능)
+            snapshot_by_pair: Dict[Tuple[str, date], Set[str]] = defaultdict(set)
+            for fid, day_map in (availability_for_write or {}).items():
+                fid = str(fid)
+                for ymd, slots in (day_map or {}).items():
+                    if not ymd or len(ymd) != 8:
+                        continue
+                    d = yyyymmdd_to_date(ymd)
+                    keys = {sk for sk in map(slot_key_from_time, slots or []) if sk}
+                    if keys:
+                        snapshot_by_pair[(fid, d)].update(keys)
 
             try:
-                send_push(sub_info, title, body)
+                with conn.transaction():
+                    snapshot_existing = preload_slots_snapshot(conn, list(snapshot_by_pair))
+            except Exception as e:
+                # preload 실패 시 전부 upsert 경로로 처리
+                print(f"[WARN] slots_snapshot preload failed: {e}")
+                snapshot_existing = {}
+
+            # 슬롯 구성이 그대로인 (시설, 날짜)는 행별 upsert 대신 쌍 단위 touch 한 번으로 처리
+            snapshot_rows, touched_pairs = split_snapshot_pairs(snapshot_by_pair, snapshot_existing)
+
+            # 10-2) 푸시 결과 수집
+            for fut in as_completed(push_jobs):
+                sid, items = push_jobs[fut]
+                try:
+                    fut.result()
+                except WebPushException as e:
+                    code = getattr(getattr(e, "response", None), "status_code", None)
+                    print(f"[PUSH_FAIL] sid={sid} alarms={len(items)} status={code} err={e}")
+                    if code in DEAD_PUSH_STATUS:
+                        dead_sids.add(sid)
+                    continue
+                except Exception as e:
+                    print(f"[PUSH_FAIL] sid={sid} alarms={len(items)} err={e}")
+                    continue
+
                 push_requests += 1
-                added_total += len(to_send)
 
                 # sent_slots bulk insert를 위해 누적
-                for sk in to_send:
-                    sent_key = sent_slot_key(baseline_group, ymd, sk)
-                    sent_rows.append((sid, sent_key))
-                    sent_map.setdefault(sid, set()).add(sent_key)
-
-            except WebPushException as e:
-                code = getattr(getattr(e, "response", None), "status_code", None)
-                print(f"[PUSH_FAIL] sid={sid} group={group} date={ymd} status={code} err={e}")
-
-        # 11) slots_snapshot 갱신(시설/날짜 단위로는 availability 기준으로 계속 갱신)
-        #     (이 테이블은 “원본 슬롯 변화 기록” 용도라 alarms와 별개로 유지 가능)
-        for fid, day_map in (availability_for_write or {}).items():
-            fid = str(fid)
-            for ymd, slots in (day_map or {}).items():
-                if not ymd or len(ymd) != 8:
-                    continue
-                d = yyyymmdd_to_date(ymd)
-                for t in (slots or []):
-                    sk = slot_key_from_time(t)
-                    if sk:
-                        snapshot_rows.append((fid, d, sk))
+                for item in items:
+                    added_total += len(item["slots"])
+                    sent_rows.extend(
+                        (sid, sent_slot_key(item["baseline_group"], item["ymd"], sk)) for sk in item["slots"]
+                    )
 
-        # 12) bulk flush
+        # 12) bulk flush (커밋은 마지막에 한 번, 각 flush는 savepoint로 분리해 실패가 서로 번지지 않게)
         try:
-            bulk_upsert_slots_snapshot(conn, snapshot_rows)
+            # baseline은 chunk별 insert 여러 개라 pipeline으로 응답을 기다리지 않고 연달아 보낸다
+            # (COPY는 pipeline 안에서 쓸 수 없으므로 snapshot/sent flush는 밖에서)
+            with conn.pipeline(), conn.transaction():
+                bulk_insert_baseline(conn, baseline_rows, commit=False)
+        except Exception as e:
+            print(f"[WARN] baseline_slots bulk insert failed: {e}")
+
+        try:
+            with conn.transaction():
+                bulk_upsert_slots_snapshot(conn, snapshot_rows, snapshot_existing, commit=False)
+                bulk_touch_slots_snapshot(conn, touched_pairs, commit=False)
         except Exception as e:
             print(f"[WARN] slots_snapshot bulk upsert failed: {e}")
 
         try:
-            bulk_mark_sent(conn, sent_rows)
+            with conn.transaction():
+                sent_inserted = bulk_mark_sent(conn, sent_rows, commit=False)
+                print(f"[SENT] staged={len(sent_rows)} inserted={sent_inserted}")
         except Exception as e:
             print(f"[WARN] sent_slots bulk insert failed: {e}")
 
-        print(f"[SUMMARY] alarms={len(alarm_keys)} baseline_inserts={baseline_inserts} push_requests={push_requests} sent_slots_added={added_total}")
+        try:
+            with conn.transaction():
+                dead_subs, dead_alarms = delete_dead_subscriptions(conn, dead_sids, commit=False)
+                if dead_subs or dead_alarms:
+                    print(f"[PUSH_GC] deleted subscriptions={dead_subs} alarms={dead_alarms}")
+        except Exception as e:
+            print(f"[WARN] dead subscription cleanup failed: {e}")
+
+        conn.commit()
+
+        print(
+            f"[SUMMARY] alarms={len(alarm_keys)} baseline_inserts={baseline_inserts} push_requests={push_requests} "
+            f"push_workers={push_workers} sent_slots_added={added_total}"
+        )
 
 
 if __name__ == "__main__":
@@ -8,7 +8,12 @@ from datetime import datetime, timedelta
 import calendar
 import os
 import urllib3
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin
+try:
+    import uvloop
+except Exception:
+    uvloop = None
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -17,11 +22,27 @@ BASE_URL = "https://publicsports.yongin.go.kr/publicsports/sports/selectFcltyRce
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0",
-    "Referer": BASE_URL
+    "Referer": BASE_URL,
+    "Connection": "keep-alive",
 }
 
-def get_connector():
-    return aiohttp.TCPConnector(limit=get_time_concurrency(), ssl=False)
+def _new_event_loop():
+    # uvloop이 설치돼 있으면(리눅스 러너) libuv 기반 루프로 요청당 asyncio 오버헤드를 줄인다
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    # Python 3.12+: 바로 끝나는 코루틴은 이벤트 루프를 한 바퀴 돌지 않고 즉시 완료
+    eager_task_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_task_factory is not None:
+        loop.set_task_factory(eager_task_factory)
+    return loop
+
+
+def run_async(coro):
+    with asyncio.Runner(loop_factory=_new_event_loop) as runner:
+        return runner.run(coro)
+
+
+def get_connector(limit=None):
+    return aiohttp.TCPConnector(limit=limit or get_time_concurrency(), ssl=False)
 
 
 def get_time_concurrency():
@@ -63,6 +84,10 @@ def _requests_session():
     if session is None:
         session = requests.Session()
         session.headers.update(HEADERS)
+        # fetch_times는 to_thread 워커 스레드마다 이 세션을 쓰고 호스트는 하나뿐이라,
+        # 풀 하나에 keep-alive 연결 하나를 계속 재사용하게 둔다(재시도는 fetch_times가 담당)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        session.mount("https://", adapter)
         _thread_local.session = session
     return session
 
@@ -29,7 +29,9 @@ class DatabaseBatchingTests(unittest.TestCase):
             commit=False,
         )
 
-        cursor.executemany.assert_called_once()
+        cursor.executemany.assert_not_called()
+        self.assertIn("copy stage_availability", cursor.copy.call_args.args[0])
+        cursor.copy.return_value.__enter__.return_value.write_row.assert_called_once()
         conn.commit.assert_not_called()
 
     def test_tracking_cleanup_can_join_outer_transaction(self):
@@ -72,6 +74,189 @@ class DatabaseBatchingTests(unittest.TestCase):
         self.assertIn("facilities", executed_sql)
         conn.commit.assert_not_called()
 
+    def test_availability_clear_skips_keep_keys_and_already_empty_rows(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        d1 = refresh_and_notify.yyyymmdd_to_date("20260712")
+        d2 = refresh_and_notify.yyyymmdd_to_date("20260713")
+
+        refresh_and_notify.clear_availability_cache_for_target(
+            conn,
+            "goyang",
+            "20260712",
+            "20260731",
+            keep_keys=[("goyang:a", d1), ("goyang:b", d2)],
+            commit=False,
+        )
+
+        sql, params = cursor.execute.call_args.args
+        self.assertIn("unnest(%s::text[], %s::date[])", sql)
+        self.assertIn("slots_json <> '[]'::jsonb", sql)
+        self.assertEqual(
+            (d1, refresh_and_notify.yyyymmdd_to_date("20260731"), "goyang:%", ["goyang:a", "goyang:b"], [d1, d2]),
+            params,
+        )
+        conn.commit.assert_not_called()
+
+        cursor.reset_mock()
+        refresh_and_notify.clear_availability_cache_for_target(conn, "goyang", "20260712", "20260731", commit=False)
+
+        sql, params = cursor.execute.call_args.args
+        self.assertNotIn("unnest", sql)
+        self.assertIn("slots_json <> '[]'::jsonb", sql)
+        self.assertEqual(3, len(params))
+
+    def test_snapshot_upsert_copies_deduplicated_rows_into_stage(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        copy = cursor.copy.return_value.__enter__.return_value
+        d = refresh_and_notify.yyyymmdd_to_date("20260712")
+
+        refresh_and_notify.bulk_upsert_slots_snapshot(
+            conn,
+            [("suwon:a", d, "09:00"), ("suwon:a", d, "09:00"), ("suwon:a", d, "10:00")],
+        )
+
+        cursor.executemany.assert_not_called()
+        self.assertIn("copy stage_snapshot", cursor.copy.call_args.args[0])
+        self.assertIn("format binary", cursor.copy.call_args.args[0])
+        copy.set_types.assert_called_once_with(["text", "date", "text", "boolean"])
+        self.assertEqual(2, copy.write_row.call_count)
+        executed_sql = "\n".join(call.args[0] for call in cursor.execute.call_args_list)
+        self.assertIn("on commit drop", executed_sql)
+        self.assertIn("from stage_snapshot", executed_sql)
+
+    def test_snapshot_split_touches_unchanged_pairs_and_upserts_only_new_keys(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        copy = cursor.copy.return_value.__enter__.return_value
+        d = refresh_and_notify.yyyymmdd_to_date("20260712")
+        existing = {("suwon:a", d): {"09:00"}, ("suwon:b", d): {"09:00"}}
+
+        snapshot_rows, touched_pairs = refresh_and_notify.split_snapshot_pairs(
+            {("suwon:a", d): {"09:00"}, ("suwon:b", d): {"09:00", "10:00"}, ("suwon:c", d): {"11:00"}},
+            existing,
+        )
+
+        self.assertEqual([("suwon:a", d)], touched_pairs)
+        self.assertEqual(
+            [("suwon:b", d, "09:00"), ("suwon:b", d, "10:00"), ("suwon:c", d, "11:00")],
+            sorted(snapshot_rows),
+        )
+
+        refresh_and_notify.bulk_upsert_slots_snapshot(conn, snapshot_rows, existing, commit=False)
+
+        # 이미 있는 키는 is_new=False로 실려 insert가 아니라 오래된 것만 update된다
+        self.assertEqual(
+            [("suwon:b", d, "09:00", False), ("suwon:b", d, "10:00", True), ("suwon:c", d, "11:00", True)],
+            sorted(call.args[0] for call in copy.write_row.call_args_list),
+        )
+        executed_sql = "\n".join(call.args[0] for call in cursor.execute.call_args_list)
+        self.assertIn("where is_new", executed_sql)
+        self.assertIn("where not s.is_new", executed_sql)
+        conn.commit.assert_not_called()
+
+    def test_snapshot_touch_updates_stale_pairs_in_one_statement(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        d1 = refresh_and_notify.yyyymmdd_to_date("20260712")
+        d2 = refresh_and_notify.yyyymmdd_to_date("20260713")
+
+        refresh_and_notify.bulk_touch_slots_snapshot(conn, [], commit=False)
+        cursor.execute.assert_not_called()
+
+        refresh_and_notify.bulk_touch_slots_snapshot(conn, [("suwon:a", d1), ("suwon:b", d2)], commit=False)
+
+        cursor.execute.assert_called_once()
+        sql, (ts, fids, dates, stale_before) = cursor.execute.call_args.args
+        self.assertIn("unnest(%s::text[], %s::date[])", sql)
+        self.assertIn("last_seen_at < %s", sql)
+        self.assertEqual(["suwon:a", "suwon:b"], fids)
+        self.assertEqual([d1, d2], dates)
+        self.assertEqual(refresh_and_notify.SNAPSHOT_TOUCH_INTERVAL, ts - stale_before)
+        conn.commit.assert_not_called()
+
+    def test_snapshot_preload_reads_all_pairs_in_one_query(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        d1 = refresh_and_notify.yyyymmdd_to_date("20260712")
+        d2 = refresh_and_notify.yyyymmdd_to_date("20260713")
+        cursor.fetchmany.side_effect = [
+            [("suwon:a", d1, "09:00"), ("suwon:a", d1, "10:00"), ("suwon:b", d2, "09:00")],
+            [],
+        ]
+
+        existing = refresh_and_notify.preload_slots_snapshot(conn, [("suwon:a", d1), ("suwon:b", d2)])
+
+        cursor.execute.assert_called_once()
+        self.assertIn("unnest(%s::text[], %s::date[])", cursor.execute.call_args.args[0])
+        self.assertEqual((["suwon:a", "suwon:b"], [d1, d2]), cursor.execute.call_args.args[1])
+        self.assertEqual({("suwon:a", d1): {"09:00", "10:00"}, ("suwon:b", d2): {"09:00"}}, existing)
+
+    def test_sent_preload_joins_candidate_pairs_only(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        cursor.fetchmany.side_effect = [[("sub-1", "g|20260712|09:00")], []]
+
+        sent = refresh_and_notify.preload_sent_slots(
+            conn,
+            [("sub-1", "g|20260712|09:00"), ("sub-2", "g|20260712|10:00")],
+        )
+
+        sql = cursor.execute.call_args.args[0]
+        self.assertIn("unnest(%s::text[], %s::text[])", sql)
+        self.assertNotIn("any(", sql)
+        self.assertEqual(
+            (["sub-1", "sub-2"], ["g|20260712|09:00", "g|20260712|10:00"]),
+            cursor.execute.call_args.args[1],
+        )
+        self.assertEqual({"sub-1": {"g|20260712|09:00"}}, sent)
+
+    def test_dead_subscription_cleanup_deletes_alarms_and_subscriptions_once(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        cursor.rowcount = 2
+
+        deleted = refresh_and_notify.delete_dead_subscriptions(conn, ["sub-2", "sub-1", "sub-2"], commit=False)
+
+        self.assertEqual((2, 2), deleted)
+        self.assertEqual(2, cursor.execute.call_count)
+        self.assertIn("public.alarms", cursor.execute.call_args_list[0].args[0])
+        self.assertIn("public.push_subscriptions", cursor.execute.call_args_list[1].args[0])
+        self.assertEqual((["sub-1", "sub-2"],), cursor.execute.call_args.args[1])
+        conn.commit.assert_not_called()
+
+    def test_mark_sent_copies_deduplicated_rows_into_stage(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        cursor.rowcount = 2
+        copy = cursor.copy.return_value.__enter__.return_value
+
+        inserted = refresh_and_notify.bulk_mark_sent(
+            conn,
+            [("sub-2", "g|20260712|09:00"), ("sub-1", "g|20260712|09:00"), ("sub-2", "g|20260712|09:00")],
+            commit=False,
+        )
+
+        self.assertEqual(2, inserted)
+        self.assertIn("copy stage_sent", cursor.copy.call_args.args[0])
+        self.assertEqual(
+            [(("sub-1", "g|20260712|09:00"),), (("sub-2", "g|20260712|09:00"),)],
+            [call.args for call in copy.write_row.call_args_list],
+        )
+        insert_sql = cursor.execute.call_args.args[0]
+        self.assertIn("on conflict do nothing", insert_sql)
+        self.assertNotIn("not exists", insert_sql)
+        conn.commit.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
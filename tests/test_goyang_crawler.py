@@ -1,10 +1,37 @@
+import io
 import os
 import sys
 import unittest
+from unittest.mock import patch
+
+import requests
+import urllib3
+from requests.structures import CaseInsensitiveDict
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 
+DAEHWA_PAGE = """<html><body>
+<table class="menu"><tr><td>메뉴</td></tr></table>
+<table summary="대화 이용신청 테이블">
+  <tr><td><table class="legend"><tr><td>범례</td></tr></table></td></tr>
+  <tr><td><input type="checkbox" name="rent_chk[]" value="A1"></td><td>06:00 ~ 08:00</td></tr>
+</table>
+<div class="footer">FOOTER</div>
+</body></html>
+"""
+
+
+def _streamed_response(data: bytes, encoding: str = "utf-8", content_length: bool = True) -> requests.Response:
+    headers = {"Content-Length": str(len(data))} if content_length else {}
+    r = requests.Response()
+    r.raw = urllib3.HTTPResponse(body=io.BytesIO(data), headers=headers, preload_content=False)
+    r.headers = CaseInsensitiveDict(headers)
+    r.encoding = encoding
+    r.status_code = 200
+    return r
+
+
 class GoyangCrawlerTests(unittest.TestCase):
     def test_gytennis_html_matches_requested_dash_date(self):
         from crawl_goyang import gytennis_html_matches_date
@@ -51,3 +78,90 @@ class GoyangCrawlerTests(unittest.TestCase):
                 ]
             },
         )
+
+    def test_parse_slots_daehwa_skips_disabled_and_date_checkboxes(self):
+        from crawl_goyang import parse_slots_daehwa
+
+        html = """
+        <table summary="대화 이용신청 테이블">
+          <tr><th>선택</th><th>시간</th></tr>
+          <tr><td><input type="checkbox" name="rent_chk[]" value="20260709"></td><td>전체</td></tr>
+          <tr><td><input type="checkbox" name="rent_chk[]" value="A1"></td><td> 6:00
+            ~ 08:00 </td></tr>
+          <tr><td><input type="checkbox" name="rent_chk[]" value="A2" disabled></td><td>08:00 ~ 10:00</td></tr>
+        </table>
+        """
+
+        self.assertEqual(
+            parse_slots_daehwa(html),
+            [{"timeContent": "06:00 ~ 08:00", "slotKey": "06:00~08:00", "rent_chk": "A1"}],
+        )
+
+    def test_parsers_accept_documents_with_xml_declaration(self):
+        from crawl_goyang import parse_gytennis_slots, parse_slots_daehwa
+
+        html = """<?xml version="1.0" encoding="utf-8"?>
+        <!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+        <html xmlns="http://www.w3.org/1999/xhtml"><body>
+        <table summary="대화 이용신청 테이블">
+          <tr><td><input type="checkbox" name="rent_chk[]" value="A1" /></td><td>06:00 ~ 08:00</td></tr>
+        </table>
+        </body></html>
+        """
+
+        self.assertEqual(
+            parse_slots_daehwa(html),
+            [{"timeContent": "06:00 ~ 08:00", "slotKey": "06:00~08:00", "rent_chk": "A1"}],
+        )
+        self.assertEqual(parse_gytennis_slots(html), {})
+
+    def test_read_until_slots_table_stops_after_the_summary_table(self):
+        import crawl_goyang
+
+        data = DAEHWA_PAGE.encode("utf-8")
+        # 태그가 청크 경계에 걸리도록 작은 청크로 읽는다
+        with patch.object(crawl_goyang, "DAEHWA_STREAM_CHUNK", 7):
+            r = _streamed_response(data)
+            body = crawl_goyang._read_until_slots_table(r)
+
+        html = crawl_goyang.fix_encoding(r, body)
+        # 안쪽 범례 표가 아니라 summary 표가 닫힌 곳에서 끊고, 작은 나머지는 연결 재사용을 위해 다 읽는다
+        self.assertTrue(html.rstrip().endswith("06:00 ~ 08:00</td></tr>\n</table>"))
+        self.assertNotIn("FOOTER", html)
+        self.assertEqual(len(data), r.raw.tell())
+        self.assertEqual(
+            crawl_goyang.parse_slots_daehwa(html),
+            [{"timeContent": "06:00 ~ 08:00", "slotKey": "06:00~08:00", "rent_chk": "A1"}],
+        )
+
+    def test_read_until_slots_table_handles_cp949_pages(self):
+        import crawl_goyang
+
+        r = _streamed_response(DAEHWA_PAGE.encode("cp949"), encoding="euc-kr")
+        body = crawl_goyang._read_until_slots_table(r)
+
+        html = crawl_goyang.fix_encoding(r, body)
+        self.assertIn("대화 이용신청 테이블", html)
+        self.assertNotIn("FOOTER", html)
+
+    def test_read_until_slots_table_reads_everything_without_summary_table(self):
+        import crawl_goyang
+
+        data = "<html><body><table><tr><td>로그인</td></tr></table><p>끝</p></body></html>".encode("utf-8")
+        r = _streamed_response(data)
+
+        self.assertEqual(data, crawl_goyang._read_until_slots_table(r))
+
+    def test_read_until_slots_table_drains_unknown_length_only_up_to_cap(self):
+        import crawl_goyang
+
+        small = DAEHWA_PAGE.encode("utf-8")
+        r = _streamed_response(small, content_length=False)
+        crawl_goyang._read_until_slots_table(r)
+        self.assertEqual(len(small), r.raw.tell())
+
+        large = small + b"x" * (crawl_goyang.DAEHWA_DRAIN_MAX * 4)
+        r = _streamed_response(large, content_length=False)
+        body = crawl_goyang._read_until_slots_table(r)
+        self.assertNotIn(b"FOOTER", body)
+        self.assertLess(r.raw.tell(), len(large))
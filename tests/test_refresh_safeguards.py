@@ -100,6 +100,63 @@ class RefreshSafeguardTests(unittest.TestCase):
             refresh_and_notify.sent_slot_key("용인|B", "20260712", morning),
         )
 
+    def test_slot_json_cache_keeps_equal_values_of_different_types_apart(self):
+        from refresh_and_notify import slot_json_for_frontend
+
+        self.assertIn('"courtNo": 1,', slot_json_for_frontend({"timeContent": "09:00", "courtNo": 1}, "r"))
+        self.assertIn('"courtNo": true,', slot_json_for_frontend({"timeContent": "09:00", "courtNo": True}, "r"))
+        self.assertIn('"courtNo": 1.0,', slot_json_for_frontend({"timeContent": "09:00", "courtNo": 1.0}, "r"))
+
+    def test_push_body_bundles_multiple_alarms_for_one_subscription(self):
+        from refresh_and_notify import build_push_body
+
+        def item(group, ymd, slots):
+            return {"group": group, "ymd": ymd, "mode": "any", "hour": None, "baseline_group": group, "slots": slots}
+
+        single = build_push_body([item("수원|만석공원", "20260712", ["09:00", "10:00"])])
+        self.assertEqual("수원|만석공원 07/12 시간 전체 신규 슬롯: 09:00, 10:00", single)
+
+        bundled = build_push_body([
+            item("수원|만석공원", "20260713", ["09:00"]),
+            item("고양|대화", "20260712", ["06:00", "07:00", "08:00", "09:00"]),
+        ])
+        self.assertEqual(
+            [
+                "고양|대화 07/12 시간 전체 신규 슬롯: 06:00, 07:00, 08:00 외 1개",
+                "수원|만석공원 07/13 시간 전체 신규 슬롯: 09:00",
+            ],
+            bundled.split("\n"),
+        )
+
+    def test_vapid_headers_are_cached_per_origin_until_near_expiry(self):
+        import refresh_and_notify
+
+        signer = refresh_and_notify.Vapid()
+        signer.sign = lambda claims: {"Authorization": f"vapid t={claims['aud']}:{claims['exp']}"}
+        endpoint = "https://push.example.com/send/abc"
+        with patch.dict(refresh_and_notify._VAPID_HEADERS, clear=True), patch.object(
+            refresh_and_notify, "_vapid_signer", return_value=signer
+        ) as make_signer, patch.object(refresh_and_notify.time, "time", return_value=1000.0) as now:
+            first = refresh_and_notify.vapid_headers_for(endpoint, "key", "mailto:a@b.c")
+            # 같은 origin의 다른 구독은 서명을 다시 하지 않는다
+            again = refresh_and_notify.vapid_headers_for("https://push.example.com/send/def", "key", "mailto:a@b.c")
+            self.assertEqual(first, again)
+            self.assertEqual(1, make_signer.call_count)
+
+            # 만료 REFRESH_MARGIN 전까지는 캐시, 그 이후에는 새 exp로 다시 서명
+            exp = 1000 + refresh_and_notify.VAPID_EXP_S
+            now.return_value = exp - refresh_and_notify.VAPID_REFRESH_MARGIN_S - 1
+            self.assertEqual(first, refresh_and_notify.vapid_headers_for(endpoint, "key", "mailto:a@b.c"))
+            now.return_value = exp - refresh_and_notify.VAPID_REFRESH_MARGIN_S
+            refreshed = refresh_and_notify.vapid_headers_for(endpoint, "key", "mailto:a@b.c")
+
+            other = refresh_and_notify.vapid_headers_for("https://fcm.example.net/x", "key", "mailto:a@b.c")
+
+        self.assertNotEqual(first, refreshed)
+        self.assertIn("https://push.example.com:", refreshed["Authorization"])
+        self.assertIn("https://fcm.example.net:", other["Authorization"])
+        self.assertEqual(3, make_signer.call_count)
+
 
 if __name__ == "__main__":
     unittest.main()